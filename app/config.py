@@ -1,5 +1,6 @@
 import os
-from redis import Redis
+from typing import Optional
+from redis.asyncio import BlockingConnectionPool, Redis
 from urllib.parse import urlparse
 import logging
 
@@ -7,33 +8,131 @@ import logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# OpenAI/LangChain 동시 호출 수 제한 (워커당)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+# 동시에 열어 둘 수 있는 LLM 스트리밍 응답 수 (워커당, 첫 토큰 이후에도 스트림이 끝날 때까지 점유)
+LLM_MAX_OPEN_STREAMS = int(os.getenv('LLM_MAX_OPEN_STREAMS', '32'))
+LLM_STREAM_ACQUIRE_TIMEOUT = float(os.getenv('LLM_STREAM_ACQUIRE_TIMEOUT', '10'))  # 스트림 슬롯을 기다리는 최대 시간 (초)
+
+# 임베딩 마이크로 배치 설정
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))  # 한 번에 보낼 최대 텍스트 수
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5'))  # 배치를 모으는 최대 대기 시간 (ms)
+
+# 벡터 저장소 write-behind 설정
+VECTOR_UPSERT_BATCH_SIZE = int(os.getenv('VECTOR_UPSERT_BATCH_SIZE', '100'))  # 한 번에 upsert할 최대 벡터 수
+VECTOR_UPSERT_WAIT_MS = float(os.getenv('VECTOR_UPSERT_WAIT_MS', '200'))  # 배치를 모으는 최대 대기 시간 (ms)
+VECTOR_UPSERT_QUEUE_SIZE = int(os.getenv('VECTOR_UPSERT_QUEUE_SIZE', '10000'))  # 대기열 최대 크기 (가득 차면 submit이 대기)
+VECTOR_UPSERT_MAX_RETRIES = int(os.getenv('VECTOR_UPSERT_MAX_RETRIES', '5'))  # 실패한 배치의 최대 재시도 횟수
+
+# 대화별 컨텍스트 저장소 설정
+CONTEXT_WINDOW_SIZE = int(os.getenv('CONTEXT_WINDOW_SIZE', '10'))  # 대화당 유지할 메시지 수
+CONTEXT_MAX_CONVERSATIONS = int(os.getenv('CONTEXT_MAX_CONVERSATIONS', '10000'))  # 워커당 보관할 최대 대화 수
+CONTEXT_MAX_BYTES = int(os.getenv('CONTEXT_MAX_BYTES', str(64 * 1024 * 1024)))  # 워커당 컨텍스트 메모리 상한
+CONTEXT_STORE_REDIS = os.getenv('CONTEXT_STORE_REDIS', 'false').lower() == 'true'  # Redis에 저장해 워커 간 공유
+RECENT_MESSAGES_CAPACITY = int(os.getenv('RECENT_MESSAGES_CAPACITY', '50'))  # Redis 최근 메시지 버퍼 크기 (대화당)
+
+# 캐릭터 목록 캐시 유효 시간 (초) - 변경 시에는 버전이 바뀌므로 TTL은 안전장치
+CHARACTER_CATALOGUE_TTL = int(os.getenv('CHARACTER_CATALOGUE_TTL', '3600'))
+
+# 캐시에 저장하는 모델의 직렬화 방식 (pydantic | orjson), 바꾸면 기존 캐시 값은 miss로 처리됨
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'orjson')
+
+# 워커별 near 캐시 (Redis 앞의 프로세스 내 LRU) 설정
+NEAR_CACHE_TTL = float(os.getenv('NEAR_CACHE_TTL', '5'))  # 항목 유효 시간 (초), 0이면 사용 안 함
+NEAR_CACHE_MAXSIZE = int(os.getenv('NEAR_CACHE_MAXSIZE', '10000'))  # 캐시별 최대 항목 수
+
+# 호감도/상호작용 횟수 카운터를 DB에 반영하는 주기 (초)
+RELATIONSHIP_FLUSH_INTERVAL = float(os.getenv('RELATIONSHIP_FLUSH_INTERVAL', '5'))
+
 redis_url = os.getenv('UPSTASH_REDIS_URL')  # UPSTASH_REDIS_URL을 사용
 
-if redis_url:
+# Redis 연결 풀 설정 (워커당)
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '20'))  # 풀 최대 연결 수
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', '2'))  # 풀에서 연결을 기다리는 최대 시간 (초)
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '5'))  # 명령 타임아웃 (초)
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', '30'))  # 유휴 연결 점검 주기 (초)
+
+redis_client: Optional[Redis] = None
+
+
+def _redis_connection_kwargs() -> dict:
     url = urlparse(redis_url)
     logger.debug(f"Parsed Redis URL: {url}")
-    redis_client = Redis(
-        host=url.hostname,
-        port=url.port,
-        password=url.password,
-        ssl=url.scheme == 'rediss',
-        ssl_cert_reqs=None,
-        decode_responses=True
+    connection_kwargs = {
+        "host": url.hostname,
+        "port": url.port,
+        "password": url.password,
+        "decode_responses": True,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": True,
+    }
+    if url.scheme == 'rediss':
+        from redis.asyncio.connection import SSLConnection
+        connection_kwargs.update(connection_class=SSLConnection, ssl_cert_reqs=None)
+    return connection_kwargs
+
+
+def create_redis_client() -> Optional[Redis]:
+    """연결 수가 제한된 풀을 사용하는 asyncio Redis 클라이언트를 생성하는 함수"""
+    if not redis_url:
+        logger.warning("No Redis URL provided")
+        return None
+
+    connection_kwargs = _redis_connection_kwargs()
+    pool = BlockingConnectionPool(
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        **connection_kwargs
     )
-else:
-    redis_client = None
-    logger.warning("No Redis URL provided")
+    return Redis(connection_pool=pool)
+
+
+def create_pubsub_client() -> Optional[Redis]:
+    """
+    pub/sub 구독 전용 Redis 클라이언트를 생성하는 함수
+
+    구독 연결은 오래 유휴 상태로 있으므로 명령 타임아웃을 두지 않고, 끊긴 연결은 health check PING으로 감지합니다.
+    redis-py가 몰래 재연결/재구독하지 않도록 재시도를 끄고, 연결 오류는 호출한 쪽에서 처리하게 합니다.
+    """
+    if not redis_url:
+        return None
+    connection_kwargs = _redis_connection_kwargs()
+    connection_kwargs.update(socket_timeout=None, retry_on_timeout=False)
+    return Redis(single_connection_client=True, **connection_kwargs)
 
-def test_redis_connection():
+
+async def init_redis_client() -> Optional[Redis]:
+    """Redis 클라이언트를 생성해 전역으로 등록하는 함수 (lifespan / 워커 시작 시 호출)"""
+    global redis_client
+    if redis_client is None:
+        redis_client = create_redis_client()
+    return redis_client
+
+
+async def close_redis_client():
+    """Redis 클라이언트와 연결 풀을 닫는 함수"""
+    global redis_client
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
+
+
+def get_redis_client() -> Optional[Redis]:
+    return redis_client
+
+
+async def test_redis_connection():
     if redis_client is None:
         print("No Redis URL provided")
         return False
     try:
-        redis_client.ping()
+        await redis_client.ping()
         print("Successfully connected to Redis")
         logger.info("Successfully connected to Redis")
         return True
     except Exception as e:
         print(f"Failed to connect to Redis: {e}")
         logger.error(f"Failed to connect to Redis: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,66 @@
+import logging
+import os
+from typing import Optional
+
+from gotrue import AsyncMemoryStorage
+from supabase import AClient, AClientOptions, acreate_client
+from supabase._async.auth_client import AsyncSupabaseAuthClient
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_KEY")
+if not supabase_url or not supabase_key:
+    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+
+# 워커당 하나의 Supabase 비동기 클라이언트 (DB 조회 전용).
+# PostgREST 요청은 이 클라이언트가 가진 HTTP/2 커넥션 풀(httpx.AsyncClient)을 공유합니다.
+# 이 클라이언트로 로그인/로그아웃을 하면 auth 이벤트가 PostgREST Authorization 헤더를
+# 마지막 사용자의 JWT로 바꾸므로, auth 호출은 create_auth_client()로 만든 별도 클라이언트를 사용합니다.
+supabase_client: Optional[AClient] = None
+
+
+async def init_supabase_client() -> AClient:
+    """Supabase 비동기 클라이언트를 생성해 전역으로 등록하는 함수 (lifespan / 워커 시작 시 호출)"""
+    global supabase_client
+    if supabase_client is None:
+        options = AClientOptions(
+            headers={"Authorization": f"Bearer {supabase_key}"},
+            auto_refresh_token=False,
+            persist_session=False,
+            storage=AsyncMemoryStorage()
+        )
+        supabase_client = await acreate_client(supabase_url, supabase_key, options)
+        logger.info("Supabase async client created")
+    return supabase_client
+
+
+async def close_supabase_client():
+    """공유 HTTP 커넥션 풀을 닫는 함수"""
+    global supabase_client
+    if supabase_client is not None:
+        await supabase_client.postgrest.aclose()
+        supabase_client = None
+
+
+def get_supabase_client() -> AClient:
+    if supabase_client is None:
+        raise RuntimeError("Supabase client is not initialized; call init_supabase_client() first")
+    return supabase_client
+
+
+def create_auth_client() -> AsyncSupabaseAuthClient:
+    """
+    요청 하나에서 쓸 Supabase Auth 클라이언트를 만드는 함수 (async with로 사용하면 닫힘)
+
+    세션을 저장하지 않는 독립된 클라이언트이므로 동시에 로그인하는 사용자끼리 세션이 섞이지 않고,
+    공유 DB 클라이언트의 헤더도 바뀌지 않습니다.
+    """
+    return AsyncSupabaseAuthClient(
+        url=f"{supabase_url}/auth/v1",
+        headers={"apiKey": supabase_key, "Authorization": f"Bearer {supabase_key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        storage=AsyncMemoryStorage()
+    )
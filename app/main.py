@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import sys
@@ -5,16 +6,17 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import Client, create_client
 
-import redis
-
-from app.config import redis_client
+from app.config import close_redis_client, init_redis_client, test_redis_connection
+from app.database import close_supabase_client, init_supabase_client
 from app.routes.characters import router as characters_router
 from app.routes.conversations import router as conversations_router
 from app.routes.users import router as users_router
 # from app.routes.scenarios import router as scenarios_router
 from app.services.auth_service import router as auth_router
+from app.services.relationship_service import RelationshipService
+from app.services.vector_writer import close_vector_writers
+from app.utils.invalidation import invalidation_bus
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -24,18 +26,32 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application is starting up")
-    from app.config import test_redis_connection, redis_client
+    app.state.supabase = await init_supabase_client()
+    app.state.redis = await init_redis_client()
     
-    if test_redis_connection():
+    if await test_redis_connection():
         logger.info("Successfully connected to Redis")
     else:
         logger.warning("Continuing without Redis connection")
+
+    # 호감도/상호작용 횟수 카운터를 주기적으로 DB에 반영
+    relationship_flusher = asyncio.create_task(RelationshipService().run_flusher()) if app.state.redis else None
+    # 다른 워커의 캐시 무효화 메시지 구독
+    invalidation_listener = asyncio.create_task(invalidation_bus.run()) if app.state.redis else None
     
     yield
     
-    if redis_client:
-        redis_client.close()
+    for task in (relationship_flusher, invalidation_listener):
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    # 대기 중인 벡터 upsert를 모두 저장한 뒤 종료
+    await close_vector_writers()
+    logger.info("Pending vector upserts flushed")
+    if app.state.redis:
+        await close_redis_client()
         logger.info("Redis connection closed")
+    await close_supabase_client()
     logger.info("Application is shutting down")
 
 app = FastAPI(debug=True, lifespan=lifespan)
@@ -46,16 +62,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Before-Cursor", "X-After-Cursor"],
 )
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-app.state.supabase = supabase
-
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"Request path: {request.url.path}")
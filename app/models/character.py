@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import ClassVar, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 class LocalizedContent(BaseModel):
@@ -99,4 +99,30 @@ class CharacterProfile(CharacterBase):
     creator_id: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CharacterSummary(BaseModel):
+    """캐릭터 목록 화면용 요약 (목록에 필요한 컬럼만 조회)"""
+    id: uuid.UUID
+    creator_id: str
+    names: LocalizedContent
+    gender: str
+    age: int
+    occupation: LocalizedContent
+    is_public: bool = False
+    thumbnail_url: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+
+    # DB에서 조회할 컬럼
+    COLUMNS: ClassVar[str] = "id, creator_id, names, gender, age, occupation, is_public, image_urls, interests"
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "CharacterSummary":
+        return cls(
+            **{key: row[key] for key in ("id", "creator_id", "names", "gender", "age", "occupation", "is_public")},
+            thumbnail_url=(row.get("image_urls") or [None])[0],
+            tags=[interest["topic"] for interest in row.get("interests") or []]
+        )
+
+    class Config:
+        from_attributes = True
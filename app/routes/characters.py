@@ -1,9 +1,9 @@
-from typing import List
+from typing import List, Literal, Union
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 
 from app.models.character import (CharacterCreate, CharacterProfile,
-                                  CharacterUpdate)
+                                  CharacterSummary, CharacterUpdate)
 from app.models.user import UserProfile as User
 from app.services.auth_service import get_current_user
 from app.services.character_service import (create_character, delete_character,
@@ -29,6 +29,13 @@ async def delete_character_route(character_id: str, current_user: User = Depends
     await delete_character(character_id, current_user)
     return {"message": "Character deleted successfully"}
 
-@router.get("/characters", response_model=List[CharacterProfile])
-async def list_characters_route(current_user: User = Depends(get_current_user)):
-    return await list_characters(current_user)
\ No newline at end of file
+@router.get("/characters", response_model=Union[List[CharacterProfile], List[CharacterSummary]])
+async def list_characters_route(
+    request: Request,
+    view: Literal["full", "summary"] = Query("full", description="summary: id, names, thumbnail and tags only"),
+    current_user: User = Depends(get_current_user)
+):
+    catalogue = await list_characters(current_user, view)
+    if catalogue.is_not_modified(request.headers):
+        return Response(status_code=304, headers=catalogue.headers)
+    return Response(content=catalogue.body, media_type="application/json", headers=catalogue.headers)
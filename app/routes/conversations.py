@@ -1,6 +1,7 @@
-from typing import List
+import os
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
 from app.models.conversation import (ConversationCreate, ConversationProfile,
                                      ConversationUpdate, MessageCreate,
@@ -9,7 +10,10 @@ from app.models.relationship import (RelationshipType,
                                      UserCharacterInteractionUpdate)
 from app.models.user import UserProfile as User
 from app.services.auth_service import get_current_user
+from app.services.character_service import is_admin
 from app.services.conversation_service import ConversationService
+from app.utils.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                                  set_cursor_headers)
 
 router = APIRouter()
 conversation_service = ConversationService()
@@ -32,21 +36,53 @@ async def delete_conversation_route(conversation_id: str, current_user: User = D
     return {"message": "Conversation deleted successfully"}
 
 @router.get("/conversations", response_model=List[ConversationProfile])
-async def list_conversations_route(current_user: User = Depends(get_current_user)):
-    return await conversation_service.list_conversations(current_user)
+async def list_conversations_route(
+    response: Response,
+    before: Optional[str] = Query(None, description="Cursor: return conversations older than this"),
+    after: Optional[str] = Query(None, description="Cursor: return conversations newer than this"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream every conversation as NDJSON"),
+    current_user: User = Depends(get_current_user)
+):
+    if stream:
+        return await conversation_service.stream_conversations(current_user)
+    conversations = await conversation_service.list_conversations(current_user, before, after, limit)
+    set_cursor_headers(response, conversations)
+    return conversations
 
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageProfile)
 async def create_message_route(conversation_id: str, message: MessageCreate, current_user: User = Depends(get_current_user)):
     return await conversation_service.create_message_and_respond(conversation_id, message, current_user)
 
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message_route(conversation_id: str, message: MessageCreate, current_user: User = Depends(get_current_user)):
+    return await conversation_service.stream_message_and_respond(conversation_id, message, current_user)
+
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageProfile])
-async def list_messages_route(conversation_id: str, current_user: User = Depends(get_current_user)):
-    return await conversation_service.list_messages(conversation_id, current_user)
+async def list_messages_route(
+    conversation_id: str,
+    response: Response,
+    before: Optional[str] = Query(None, description="Cursor: return messages older than this"),
+    after: Optional[str] = Query(None, description="Cursor: return messages newer than this"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream every message as NDJSON"),
+    current_user: User = Depends(get_current_user)
+):
+    if stream:
+        return await conversation_service.stream_messages(conversation_id, current_user)
+    messages = await conversation_service.list_messages(conversation_id, current_user, before, after, limit)
+    set_cursor_headers(response, messages)
+    return messages
 
 @router.get("/conversations/{conversation_id}/messages/{message_id}", response_model=MessageProfile)
 async def get_message_route(conversation_id: str, message_id: str, current_user: User = Depends(get_current_user)):
     return await conversation_service.get_message(message_id, current_user)
 
+@router.get("/conversations/{conversation_id}/messages/{message_id}/embedding")
+async def get_message_embedding_route(conversation_id: str, message_id: str, current_user: User = Depends(get_current_user)):
+    embedding = await conversation_service.get_message_embedding(message_id, current_user)
+    return {"embedding": embedding}
+
 @router.post("/conversations/{conversation_id}/summarize")
 async def summarize_conversation_route(conversation_id: str, current_user: User = Depends(get_current_user)):
     summary = await conversation_service.summarize_conversation(conversation_id, current_user)
@@ -59,9 +95,17 @@ async def get_similar_messages_route(
     top_k: int = Query(5, description="Number of similar messages to return"),
     current_user: User = Depends(get_current_user)
 ):
+    await conversation_service.get_conversation(conversation_id, current_user)
     similar_messages = await conversation_service.get_similar_messages(conversation_id, message_content, top_k)
     return {"similar_messages": similar_messages}
 
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats_route(current_user: User = Depends(get_current_user)):
+    """임베딩 캐시 통계 (관리자 전용, 요청을 처리한 워커 프로세스의 카운터이며 워커 간 합계가 아님)"""
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return {"scope": "worker", "pid": os.getpid(), **conversation_service.ai_service.get_embedding_cache_stats()}
+
 @router.get("/conversations/{conversation_id}/message-count")
 async def get_message_count_route(conversation_id: str, current_user: User = Depends(get_current_user)):
     count = await conversation_service.get_message_count(conversation_id)
@@ -91,6 +135,6 @@ async def update_relationship_type_route(
     await conversation_service.relationship_service.update_interaction(
         str(conversation.character_id),
         str(current_user.id),
-        relationship_type
+        UserCharacterInteractionUpdate(relationship_type=relationship_type)
     )
     return {"message": "Relationship type updated successfully"}
\ No newline at end of file
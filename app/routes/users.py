@@ -2,13 +2,14 @@ from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Request, logger
 from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
 from app.models.user import UserBase, UserCreate, UserProfile, UserUpdate
 from app.services.auth_service import (auth_callback, get_current_user,
                                        get_linked_accounts, get_user_profile,
                                        login_user, logout_user, process_token,
-                                       register_user, social_login,
+                                       register_user, security, social_login,
                                        update_user_profile)
 
 router = APIRouter()
@@ -16,7 +17,7 @@ router = APIRouter()
 @router.post("/register")
 async def register(user: UserCreate):
     try:
-        result = register_user(user.email, user.password, user.nickname)
+        result = await register_user(user.email, user.password, user.nickname)
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -28,7 +29,7 @@ class UserBase(BaseModel):
 @router.post("/login")
 async def login(user: UserBase):
     try:
-        result = login_user(user.email, user.password)
+        result = await login_user(user.email, user.password)
         return result
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
@@ -36,7 +37,7 @@ async def login(user: UserBase):
 @router.post("/social-login/{provider}")
 async def social_login_route(provider: str, request: Request):
     try:
-        response = social_login(provider, request)
+        response = await social_login(provider, request)
         return JSONResponse(content=response)
     except HTTPException as e:
         return JSONResponse(content={"detail": e.detail}, status_code=e.status_code)
@@ -69,8 +70,8 @@ async def update_profile(user_update: UserUpdate, user=Depends(get_current_user)
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
 @router.post("/logout")
-async def logout(user=Depends(get_current_user)):
-    return await logout_user()
+async def logout(user=Depends(get_current_user), credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await logout_user(credentials.credentials)
 
 @router.get("/linked-accounts", response_model=List[str])
 async def linked_accounts(user=Depends(get_current_user)):
@@ -1,75 +1,131 @@
 import asyncio
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 # .env 파일 로드
 load_dotenv()
 
-import openai
-from pinecone import Pinecone, ServerlessSpec
+from openai import AsyncOpenAI
+
+from app.config import (EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS,
+                        LLM_MAX_CONCURRENCY, LLM_MAX_OPEN_STREAMS,
+                        VECTOR_UPSERT_BATCH_SIZE,
+                        VECTOR_UPSERT_MAX_RETRIES, VECTOR_UPSERT_QUEUE_SIZE,
+                        VECTOR_UPSERT_WAIT_MS)
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.vector_store import create_vector_store
+from app.services.vector_writer import VectorWriteBehind
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+_llm_stream_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """OpenAI/LangChain 호출의 동시 실행 수를 제한하는 워커 공용 세마포어 (이벤트 루프 안에서 생성)"""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+def get_llm_stream_semaphore() -> asyncio.Semaphore:
+    """열려 있는 LLM 스트리밍 응답 수를 제한하는 워커 공용 세마포어 (스트림이 끝날 때까지 점유)"""
+    global _llm_stream_semaphore
+    if _llm_stream_semaphore is None:
+        _llm_stream_semaphore = asyncio.Semaphore(LLM_MAX_OPEN_STREAMS)
+    return _llm_stream_semaphore
 
 
 class AIService:
     def __init__(self):
-        openai.api_key = os.environ.get('OPENAI_API_KEY')
+        self.openai_client = AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+        self.embedding_cache = EmbeddingCache()
+        self.embedding_batcher = EmbeddingBatcher(self.embed_batch, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS)
 
-        # Pinecone 초기화
-        self.pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
-        
-        # 인덱스 이름 가져오기
-        index_name = os.environ.get("PINECONE_INDEX_NAME")
-
-        # 인덱스가 존재하지 않으면 생성
-        if index_name not in self.pc.list_indexes().names():
-            self.pc.create_index(
-                name=index_name,
-                dimension=1536,  # OpenAI의 text-embedding-ada-002 모델의 출력 차원
-                metric='cosine',
-                spec=ServerlessSpec(cloud=os.environ.get("PINECONE_CLOUD", "aws"), 
-                                    region=os.environ.get("PINECONE_REGION", "us-west-2"))
-            )
-        
-        # 인덱스 연결
-        self.index = self.pc.Index(index_name)
-
-    def vectorize_text(self, text: str) -> List[float]:
-        """텍스트를 벡터로 변환하는 메서드"""
-        response = openai.Embedding.create(
-            input=text,
-            model="text-embedding-ada-002"
+        # 벡터 저장소 초기화 (VECTOR_STORE_BACKEND: pinecone | local)
+        self.vector_store = create_vector_store()
+        self.vector_writer = VectorWriteBehind(
+            self.vector_store,
+            max_batch_size=VECTOR_UPSERT_BATCH_SIZE,
+            max_wait_ms=VECTOR_UPSERT_WAIT_MS,
+            max_queue_size=VECTOR_UPSERT_QUEUE_SIZE,
+            max_retries=VECTOR_UPSERT_MAX_RETRIES
         )
-        embedding = response['data'][0]['embedding']
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """텍스트 목록을 한 번의 임베딩 API 호출로 벡터화하는 메서드 (캐시 미사용)"""
+        async with get_llm_semaphore():
+            response = await self.openai_client.embeddings.create(
+                input=texts,
+                model=EMBEDDING_MODEL
+            )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def vectorize_text(self, text: str) -> List[float]:
+        """텍스트를 벡터로 변환하는 메서드 (같은 텍스트는 임베딩 캐시에서 반환)"""
+        cached = await self.embedding_cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+
+        # 동시에 들어온 다른 요청들과 묶어서 한 번에 전송
+        embedding = await self.embedding_batcher.embed(text)
+        await self.embedding_cache.set(EMBEDDING_MODEL, text, embedding)
         return embedding
 
+    async def vectorize_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        여러 텍스트를 한꺼번에 벡터로 변환하는 메서드
+
+        캐시에 없는 텍스트만 중복 없이 EMBEDDING_BATCH_SIZE 단위로 나눠 전송합니다.
+
+        :param texts: 벡터화할 텍스트 목록
+        :return: 입력과 같은 순서의 벡터 목록
+        """
+        cached = await asyncio.gather(*(self.embedding_cache.get(EMBEDDING_MODEL, text) for text in texts))
+        vectors: Dict[str, List[float]] = {text: vector for text, vector in zip(texts, cached) if vector is not None}
+
+        missing = list(dict.fromkeys(text for text in texts if text not in vectors))
+        chunks = [missing[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(missing), EMBEDDING_BATCH_SIZE)]
+        for chunk, embeddings in zip(chunks, await asyncio.gather(*(self.embed_batch(chunk) for chunk in chunks))):
+            for text, embedding in zip(chunk, embeddings):
+                vectors[text] = embedding
+                await self.embedding_cache.set(EMBEDDING_MODEL, text, embedding)
+
+        return [vectors[text] for text in texts]
+
+    def get_embedding_cache_stats(self) -> Dict[str, int]:
+        """임베딩 캐시 적중/실패 통계를 반환하는 메서드"""
+        return self.embedding_cache.stats()
+
     def store_vector(self, id: str, vector: List[float], metadata: Dict[str, Any]):
-        """벡터를 Pinecone에 저장하는 메서드"""
-        self.index.upsert(vectors=[(id, vector, metadata)])
+        """벡터를 벡터 저장소에 저장하는 메서드"""
+        self.vector_store.upsert([(id, vector, metadata)])
 
     async def store_vector_async(self, id: str, vector: List[float], metadata: Dict[str, Any]):
-        """벡터를 Pinecone에 비동기적으로 저장하는 메서드"""
-        # 비동기 실행을 위해 run_in_executor 사용
-        await asyncio.get_event_loop().run_in_executor(
-            None, self.store_vector, id, vector, metadata
-        )
+        """
+        벡터를 write-behind 대기열에 넣는 메서드
+
+        실제 upsert는 백그라운드에서 다른 벡터들과 묶어 처리되므로 저장 완료를 기다리지 않습니다.
+        """
+        await self.vector_writer.submit(id, vector, metadata)
 
     
-    def search_similar_vectors(self, vector: List[float], conversation_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    async def search_similar_vectors(self, vector: List[float], conversation_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         특정 대화 내에서 유사한 벡터를 검색하는 메서드
+
+        저장소 검색(Pinecone HTTP 요청 / 로컬 mmap 읽기)은 동기 호출이므로 스레드에서 실행해 이벤트 루프를 막지 않습니다.
         
         :param vector: 검색할 벡터
         :param conversation_id: 검색 대상 대화 ID
         :param top_k: 반환할 최대 결과 수
         :return: 유사한 벡터들의 정보 (ID, 점수, 메타데이터)
         """
-        results = self.index.query(
-            vector=vector,
-            top_k=top_k,
-            include_metadata=True,
-            filter={"conversation_id": conversation_id}
-        )
-        return results['matches']
+        return await asyncio.to_thread(self.vector_store.query, vector, conversation_id, top_k)
     
     async def generate_response(self, context: str) -> str:
         """
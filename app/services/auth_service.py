@@ -1,24 +1,24 @@
+import asyncio
+import json
 import logging
 import os
+from typing import Any, Dict, Optional
 
+import jwt
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
-from supabase import Client, create_client
+
+from app.config import get_redis_client
+from app.database import create_auth_client, get_supabase_client
+from app.utils.cache import LRUCache
 
 router = APIRouter()
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
 security = HTTPBearer()
 
 class User(BaseModel):
@@ -27,9 +27,10 @@ class User(BaseModel):
     is_admin: bool = False  # is_admin 필드 추가
 
 
-def get_supabase_token(email: str, password: str) -> str:
+async def get_supabase_token(email: str, password: str) -> str:
     try:
-        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        async with create_auth_client() as auth:
+            response = await auth.sign_in_with_password({"email": email, "password": password})
         if response and response.session:
             return response.session.access_token
         else:
@@ -38,29 +39,124 @@ def get_supabase_token(email: str, password: str) -> str:
         print(f"Supabase Auth Error: {str(e)}")
         raise HTTPException(status_code=401, detail="Supabase authentication error")
 
+# 로컬 JWT 검증 설정 (토큰 헤더의 alg에 따라 선택)
+# - HS256: SUPABASE_JWT_SECRET이 있으면 로컬 검증, 없으면 Supabase Auth(get_user)에 확인
+# - RS256/ES256: JWKS 공개키로 검증 (SUPABASE_JWKS_URL이 없으면 프로젝트 기본 JWKS 주소 사용)
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{os.getenv('SUPABASE_URL').rstrip('/')}/auth/v1/.well-known/jwks.json" if os.getenv("SUPABASE_URL") else None
+)
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# 사용자 프로필 클레임(is_admin 등) 캐시 유효 시간 (초)
+USER_CLAIMS_LOCAL_TTL = 30
+USER_CLAIMS_REDIS_TTL = 300
+
+_jwks_client: Optional[jwt.PyJWKClient] = None
+_user_claims_cache = LRUCache(maxsize=10000, ttl=USER_CLAIMS_LOCAL_TTL)
+
+
+def _get_jwks_client() -> Optional[jwt.PyJWKClient]:
+    global _jwks_client
+    if _jwks_client is None and SUPABASE_JWKS_URL:
+        _jwks_client = jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_keys=True, lifespan=3600)
+    return _jwks_client
+
+
+async def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Supabase 액세스 토큰을 로컬에서 검증하는 함수
+
+    :param token: Bearer 토큰
+    :return: 검증된 JWT 클레임, 로컬 검증 수단이 없으면 None (Supabase Auth에 확인해야 함)
+    :raises jwt.PyJWTError: 서명/만료/audience 검증 실패 또는 지원하지 않는 알고리즘
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+
+    if algorithm == "HS256":
+        # 기본(HS256) 서명 프로젝트는 JWKS에 키가 없으므로 시크릿이 없으면 원격 확인
+        if not SUPABASE_JWT_SECRET:
+            return None
+        return jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience=SUPABASE_JWT_AUDIENCE)
+
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+    jwks_client = _get_jwks_client()
+    if jwks_client is None:
+        return None
+    # 키 목록은 캐시되며, 처음이나 키 교체 시에만 네트워크 요청이 발생하므로 스레드에서 실행
+    signing_key = await asyncio.to_thread(jwks_client.get_signing_key_from_jwt, token)
+    return jwt.decode(token, signing_key.key, algorithms=[algorithm], audience=SUPABASE_JWT_AUDIENCE)
+
+
+def _user_claims_key(user_id: str) -> str:
+    return f"user_claims:{user_id}"
+
+
+async def get_user_claims(user_id: str) -> Dict[str, Any]:
+    """users 테이블의 프로필 클레임(is_admin)을 짧은 TTL 캐시(프로세스 내 + Redis)와 함께 조회하는 함수"""
+    claims = _user_claims_cache.get(user_id)
+    if claims is not None:
+        return claims
+
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        cached = await redis_client.get(_user_claims_key(user_id))
+        if cached:
+            claims = json.loads(cached)
+            _user_claims_cache.set(user_id, claims)
+            return claims
+
+    user_data = await get_supabase_client().table("users").select("is_admin").eq("id", user_id).maybe_single().execute()
+    claims = {"is_admin": bool(user_data.data.get('is_admin', False)) if user_data and user_data.data else False}
+
+    _user_claims_cache.set(user_id, claims)
+    if redis_client is not None:
+        await redis_client.setex(_user_claims_key(user_id), USER_CLAIMS_REDIS_TTL, json.dumps(claims))
+    return claims
+
+
+async def invalidate_user_claims(user_id: str):
+    """프로필이 바뀌었을 때 캐시된 클레임을 지우는 함수"""
+    _user_claims_cache.delete(user_id)
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        await redis_client.delete(_user_claims_key(user_id))
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        response = supabase.auth.get_user(token)
-        if response and response.user:
-            # is_admin 정보를 가져오는 로직 추가
-            user_data = supabase.table("users").select("is_admin").eq("id", response.user.id).single().execute()
-            is_admin = user_data.data.get('is_admin', False) if user_data.data else False
-            return User(id=response.user.id, email=response.user.email, is_admin=is_admin)  # is_admin 추가
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        claims = await verify_access_token(token)
+        if claims is not None:
+            user_id, email = claims["sub"], claims.get("email", "")
+        else:
+            # 로컬 검증 수단이 없으면 Supabase Auth에 확인
+            async with create_auth_client() as auth:
+                response = await auth.get_user(token)
+            if not (response and response.user):
+                raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+            user_id, email = response.user.id, response.user.email
+
+        # is_admin 정보를 가져오는 로직 추가
+        user_claims = await get_user_claims(user_id)
+        return User(id=user_id, email=email, is_admin=user_claims["is_admin"])  # is_admin 추가
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid authentication credentials: {str(e)}")
 
 
-def register_user(email: str, password: str, nickname: str):
+async def register_user(email: str, password: str, nickname: str):
     try:
-        auth_response = supabase.auth.sign_up({
-            "email": email,
-            "password": password
-        })
+        async with create_auth_client() as auth:
+            auth_response = await auth.sign_up({
+                "email": email,
+                "password": password
+            })
 
         if auth_response.user:
-            user_data = supabase.table("users").insert({
+            user_data = await get_supabase_client().table("users").insert({
                 "id": auth_response.user.id,
                 "email": email,
                 "nickname": nickname,
@@ -82,10 +178,11 @@ def register_user(email: str, password: str, nickname: str):
 
 
     
-def login_user(email: str, password: str):
+async def login_user(email: str, password: str):
     try:
         logger.info(f"Attempting login for email: {email}")
-        auth_response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        async with create_auth_client() as auth:
+            auth_response = await auth.sign_in_with_password({"email": email, "password": password})
         logger.info(f"Auth response: {auth_response}")
 
         if auth_response.user and auth_response.session:
@@ -106,16 +203,17 @@ def login_user(email: str, password: str):
         else:
             raise HTTPException(status_code=401, detail="Login failed. Please try again.")
 
-def social_login(provider: str, request: Request):
+async def social_login(provider: str, request: Request):
     try:
         callback_url = "http://localhost:8000/auth/callback"
         logger.info(f"Callback URL: {callback_url}")
-        auth_response = supabase.auth.sign_in_with_oauth({
-            "provider": provider,
-            "options": {
-                "redirect_to": callback_url
-            }
-        })
+        async with create_auth_client() as auth:
+            auth_response = await auth.sign_in_with_oauth({
+                "provider": provider,
+                "options": {
+                    "redirect_to": callback_url
+                }
+            })
 
         logger.info(f"Auth response: {auth_response}")
         if hasattr(auth_response, 'url'):
@@ -235,7 +333,8 @@ async def process_token(token_data: dict):
             raise HTTPException(status_code=400, detail="Access token not provided")
 
         # 액세스 토큰을 사용하여 사용자 정보 가져오기
-        user = supabase.auth.get_user(access_token)
+        async with create_auth_client() as auth:
+            user = await auth.get_user(access_token)
         
         if not user or not user.user:
             raise HTTPException(status_code=400, detail="User information not found")
@@ -244,7 +343,7 @@ async def process_token(token_data: dict):
         user_email = user.user.email
         
         # 사용자 정보 조회
-        user_data = supabase.table("users").select("*").eq("id", user_id).execute()
+        user_data = await get_supabase_client().table("users").select("*").eq("id", user_id).execute()
         logger.debug(f"User data: {user_data}")
         
         if user_data.data:
@@ -260,7 +359,7 @@ async def process_token(token_data: dict):
                 "login_type": "social",
                 "is_admin": False  # 새 사용자는 기본적으로 관리자가 아님
             }
-            insert_result = supabase.table("users").insert(new_user).execute()
+            insert_result = await get_supabase_client().table("users").insert(new_user).execute()
             logger.debug(f"Insert result: {insert_result}")
             if not insert_result.data:
                 raise HTTPException(status_code=500, detail="Failed to create new user")
@@ -281,7 +380,7 @@ async def process_token(token_data: dict):
 async def get_user_profile(user: User = Depends(get_current_user)):
     try:
         logger.debug(f"Fetching profile for user ID: {user.id}")
-        user_data = supabase.table("users").select("*").eq("id", user.id).single().execute()
+        user_data = await get_supabase_client().table("users").select("*").eq("id", user.id).single().execute()
         if user_data.data:
             logger.debug(f"User data retrieved: {user_data.data}")
             # is_admin 정보를 포함하여 반환
@@ -296,9 +395,10 @@ async def get_user_profile(user: User = Depends(get_current_user)):
 async def update_user_profile(user_update, user):
     try:
         update_data = user_update.dict(exclude_unset=True)
-        response: APIResponse = supabase.table("users").update(update_data).eq("id", user.id).execute()
+        response: APIResponse = await get_supabase_client().table("users").update(update_data).eq("id", user.id).execute()
         
         if response.data and len(response.data) > 0:
+            await invalidate_user_claims(user.id)
             return response.data[0]
         else:
             raise HTTPException(status_code=404, detail="User profile not found")
@@ -306,16 +406,18 @@ async def update_user_profile(user_update, user):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def logout_user():
+async def logout_user(access_token: str):
     try:
-        supabase.auth.sign_out()
+        # 해당 사용자의 refresh 토큰을 모두 폐기 (공유 클라이언트의 세션은 건드리지 않음)
+        async with create_auth_client() as auth:
+            await auth.admin.sign_out(access_token)
         return {"message": "Logout successful"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 async def get_linked_accounts(user):
     try:
-        user_data = supabase.table("users").select("login_type").eq("id", user.id).execute()
+        user_data = await get_supabase_client().table("users").select("login_type").eq("id", user.id).execute()
         if user_data and user_data.get("data"):
             return [user_data["data"][0]['login_type']]
         else:
@@ -0,0 +1,87 @@
+from functools import lru_cache
+from typing import Dict
+
+from langchain.chains.summarize import load_summarize_chain
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI, OpenAI
+
+# 템플릿 이름 -> (입력 변수, 템플릿)
+PROMPT_TEMPLATES = {
+    "reply": (
+        ["persona", "context", "recent_messages", "summary", "similar_messages", "affinity_level", "relationship_type", "nickname"],
+        """
+        당신은 AI 캐릭터입니다. 다음 정보를 바탕으로 사용자와의 대화에 참여하세요:
+
+        캐릭터 설정:
+        {persona}
+
+        컨텍스트: {context}
+        최근 메시지들: {recent_messages}
+        대화 요약: {summary}
+        유사한 과거 메시지들: {similar_messages}
+        사용자에 대한 호감도: {affinity_level}
+        사용자와의 관계: {relationship_type}
+        사용자의 별명: {nickname}
+
+        위 정보를 참고하여 캐릭터 설정에 맞는 자연스럽고 개성 있는 답변을 생성하세요.
+        호감도와 관계 유형에 맞는 적절한 어조와 친밀도를 사용하세요.
+        이전 대화 내용과 일관성을 유지하면서, 대화를 발전시키는 답변을 제공하세요.
+        """
+    ),
+    "affinity": (
+        ["summary"],
+        """
+        다음은 대화의 요약입니다:
+        {summary}
+
+        이 대화 요약을 바탕으로, AI 캐릭터의 사용자에 대한 호감도 변화를 평가해주세요.
+        호감도 변화를 -5에서 5 사이의 숫자로 표현해주세요.
+        -5는 AI 캐릭터가 사용자에 대해 매우 부정적인 변화를 느낌, 0은 변화 없음, 5는 매우 긍정적인 변화를 느낌을 의미합니다.
+
+        호감도 변화 점수:
+        """
+    ),
+}
+
+
+class ChainRegistry:
+    """
+    프롬프트 템플릿과 LLM 클라이언트, 체인을 시작 시 한 번만 만들어 재사용하는 레지스트리
+
+    템플릿은 선언된 입력 변수와 실제 {변수}가 일치하는지 생성 시 검증합니다.
+    요청마다 달라지는 값(max_tokens 등)은 bind()로만 덮어써서 클라이언트를 새로 만들지 않습니다.
+    """
+
+    def __init__(self):
+        self.prompts: Dict[str, PromptTemplate] = {
+            name: self._compile(name, input_variables, template)
+            for name, (input_variables, template) in PROMPT_TEMPLATES.items()
+        }
+
+        # LLM 클라이언트 (내부 HTTP 커넥션 풀을 요청 간에 공유)
+        self.chat_llm = ChatOpenAI(temperature=0.7)
+        self.summary_llm = OpenAI(temperature=0)
+
+        self.summarize_chain = load_summarize_chain(self.summary_llm, chain_type="map_reduce")
+        self.affinity_chain = self.prompts["affinity"] | self.chat_llm | StrOutputParser()
+
+    @staticmethod
+    def _compile(name: str, input_variables, template: str) -> PromptTemplate:
+        prompt = PromptTemplate.from_template(template)
+        if set(prompt.input_variables) != set(input_variables):
+            raise ValueError(
+                f"Prompt template '{name}' variables {sorted(prompt.input_variables)} "
+                f"do not match declared {sorted(input_variables)}"
+            )
+        return prompt
+
+    def reply_chain(self, max_tokens: int) -> Runnable:
+        """응답 생성 체인 (공유 클라이언트에 max_tokens만 요청별로 지정)"""
+        return self.prompts["reply"] | self.chat_llm.bind(max_tokens=max_tokens) | StrOutputParser()
+
+
+@lru_cache(maxsize=None)
+def get_chain_registry() -> ChainRegistry:
+    return ChainRegistry()
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, List, Mapping, Tuple
+
+from app.config import CHARACTER_CATALOGUE_TTL, get_redis_client
+from app.utils.cache import LRUCache
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# 범위(scope) -> 해당 범위의 캐릭터 JSON 객체들을 쉼표로 이은 문자열
+ScopeLoader = Callable[[str], Awaitable[str]]
+
+
+@dataclass
+class CatalogueSnapshot:
+    """직렬화된 캐릭터 목록과 조건부 요청에 쓰는 검증자(ETag, Last-Modified)"""
+    body: str
+    etag: str
+    last_modified: datetime
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            # 사용자마다 목록이 다르므로 공유 캐시에는 저장하지 않고, 매번 재검증하도록 함
+            "Cache-Control": "private, no-cache",
+        }
+
+    def is_not_modified(self, request_headers: Mapping[str, str]) -> bool:
+        """클라이언트가 가진 사본이 최신인지 확인하는 메서드 (If-None-Match가 있으면 우선)"""
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            # HTTP 날짜는 초 단위까지만 표현됨
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+
+class CharacterCatalogue:
+    """
+    캐릭터 목록의 버전 관리 캐시 (프로세스 내 LRU + Redis)
+
+    목록은 범위(scope) 단위로 직렬화해 저장합니다.
+        - "all": 관리자용 전체 목록
+        - "public": 공개 캐릭터 (모든 사용자가 공유)
+        - "private:{user_id}": 사용자가 만든 비공개 캐릭터
+    캐릭터가 생성/수정/삭제되면 invalidate()로 카탈로그 버전을 올리며,
+    캐시 키에 버전이 포함되므로 이전 버전의 항목은 더 이상 읽히지 않고 TTL로 사라집니다.
+    버전은 Redis에 두어 모든 워커가 같은 버전을 보도록 하고, Redis가 없으면 프로세스 내에서만 관리합니다.
+    """
+
+    KEY_PREFIX = "character_catalogue"
+
+    def __init__(self, maxsize: int = 1024, ttl: int = CHARACTER_CATALOGUE_TTL):
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._version = 0
+        self._modified_at = time.time()
+
+    @property
+    def meta_key(self) -> str:
+        return f"{self.KEY_PREFIX}:meta"
+
+    def _part_key(self, version: int, scope: str) -> str:
+        return f"{self.KEY_PREFIX}:{version}:{scope}"
+
+    async def current_version(self) -> Tuple[int, float]:
+        """(카탈로그 버전, 마지막 변경 시각) - Redis를 사용할 수 없으면 프로세스 내 값"""
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                version, modified_at = await redis_client.hmget(self.meta_key, "version", "modified_at")
+                if version is None:
+                    await redis_client.hsetnx(self.meta_key, "version", 0)
+                    await redis_client.hsetnx(self.meta_key, "modified_at", self._modified_at)
+                    return 0, self._modified_at
+                return int(version), float(modified_at or self._modified_at)
+            except Exception as e:
+                logger.warning(f"Character catalogue version read failed: {str(e)}")
+        return self._version, self._modified_at
+
+    async def invalidate(self):
+        """캐릭터 변경 후 카탈로그 버전을 올리는 메서드"""
+        self._version += 1
+        self._modified_at = time.time()
+        self.local.clear()
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                async with redis_client.pipeline(transaction=True) as pipe:
+                    pipe.hincrby(self.meta_key, "version", 1)
+                    pipe.hset(self.meta_key, "modified_at", self._modified_at)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Character catalogue invalidation failed: {str(e)}")
+
+    async def _get_part(self, version: int, scope: str, loader: ScopeLoader) -> Tuple[str, str]:
+        """범위 하나의 (직렬화된 JSON 조각, 해시)를 캐시에서 가져오거나 loader로 채우는 메서드"""
+        key = self._part_key(version, scope)
+        part = self.local.get(key)
+        if part is not None:
+            return part
+
+        redis_client = get_redis_client()
+        body = None
+        if redis_client is not None:
+            try:
+                body = await redis_client.get(key)
+            except Exception as e:
+                logger.warning(f"Character catalogue read failed: {str(e)}")
+
+        if body is None:
+            body = await loader(scope)
+            if redis_client is not None:
+                try:
+                    await redis_client.setex(key, self.ttl, body)
+                except Exception as e:
+                    logger.warning(f"Character catalogue write failed: {str(e)}")
+
+        part = (body, hashlib.sha1(body.encode("utf-8")).hexdigest())
+        self.local.set(key, part)
+        return part
+
+    async def snapshot(self, scopes: List[str], loader: ScopeLoader) -> CatalogueSnapshot:
+        """
+        여러 범위를 합친 목록의 스냅샷을 만드는 메서드
+
+        ETag는 내용의 해시이므로 다른 사용자의 비공개 캐릭터가 바뀌어도 이 사용자의 ETag는 그대로입니다.
+        """
+        version, modified_at = await self.current_version()
+        parts = [await self._get_part(version, scope, loader) for scope in scopes]
+
+        body = "[" + ",".join(part for part, _ in parts if part) + "]"
+        etag = '"' + hashlib.sha1("|".join(digest for _, digest in parts).encode("ascii")).hexdigest()[:20] + '"'
+        return CatalogueSnapshot(body, etag, datetime.fromtimestamp(modified_at, tz=timezone.utc))
+
+
+character_catalogue = CharacterCatalogue()
@@ -1,15 +1,18 @@
 # services/character_service.py
 
 import logging
-import os
-from typing import List
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException
-from supabase import Client, create_client
 
+from app.database import get_supabase_client
 from app.models.character import (CharacterCreate, CharacterProfile,
-                                  CharacterUpdate)
+                                  CharacterSummary, CharacterUpdate,
+                                  LanguageProficiency)
 from app.models.user import UserProfile as User
+from app.services.character_catalogue import (CatalogueSnapshot,
+                                              character_catalogue)
+from app.services.persona_compiler import CompiledPersona, persona_compiler
 
 router = APIRouter()
 
@@ -17,13 +20,6 @@ router = APIRouter()
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
-
-
-supabase: Client = create_client(supabase_url, supabase_key)
 def is_admin(user: User) -> bool:
     return user.is_admin
 
@@ -40,8 +36,9 @@ async def create_character(character: CharacterCreate, current_user: User) -> Ch
             if field in character_data:
                 character_data[field] = character_data[field].dict()
         
-        response = supabase.table("characters").insert(character_data).execute()
+        response = await get_supabase_client().table("characters").insert(character_data).execute()
         if response.data:
+            await character_catalogue.invalidate()
             return CharacterProfile(**response.data[0])
         else:
             raise HTTPException(status_code=400, detail="Failed to create character")
@@ -51,10 +48,11 @@ async def create_character(character: CharacterCreate, current_user: User) -> Ch
 
 async def get_character(character_id: str, current_user: User) -> CharacterProfile:
     try:
-        response = supabase.table("characters").select("*").eq("id", character_id).execute()
+        response = await get_supabase_client().table("characters").select("*").eq("id", character_id).execute()
         if response.data:
             character = response.data[0]
-            if character['creator_id'] == current_user.id or is_admin(current_user):
+            # 공개 캐릭터는 목록과 마찬가지로 누구나 상세 정보를 볼 수 있음 (수정/삭제는 각 함수에서 소유자만 허용)
+            if character.get('is_public') or character['creator_id'] == current_user.id or is_admin(current_user):
                 return CharacterProfile(**character)
             else:
                 raise HTTPException(status_code=403, detail="You don't have permission to access this character")
@@ -77,8 +75,10 @@ async def update_character(character_id: str, character: CharacterUpdate, curren
             if field in update_data:
                 update_data[field] = update_data[field].dict()
         
-        response = supabase.table("characters").update(update_data).eq("id", character_id).execute()
+        response = await get_supabase_client().table("characters").update(update_data).eq("id", character_id).execute()
         if response.data:
+            await character_catalogue.invalidate()
+            persona_compiler.invalidate(character_id)
             return CharacterProfile(**response.data[0])
         else:
             raise HTTPException(status_code=400, detail="Failed to update character")
@@ -92,24 +92,72 @@ async def delete_character(character_id: str, current_user: User):
         if existing_character.creator_id != current_user.id and not is_admin(current_user):
             raise HTTPException(status_code=403, detail="You don't have permission to delete this character")
         
-        response = supabase.table("characters").delete().eq("id", character_id).execute()
+        response = await get_supabase_client().table("characters").delete().eq("id", character_id).execute()
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to delete character")
+        await character_catalogue.invalidate()
+        persona_compiler.invalidate(character_id)
     except Exception as e:
         logger.error(f"Error deleting character: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
-async def list_characters(current_user: User) -> List[CharacterProfile]:
+async def get_persona(character_id: str, locale: Optional[str] = None) -> CompiledPersona:
+    """
+    응답 생성에 사용할 캐릭터의 페르소나 프롬프트 조각을 반환하는 함수 (권한 확인 없음, 내부용)
+
+    버전과 언어 정보만 먼저 조회하고, 해당 버전의 조각이 캐시에 없을 때만 전체 프로필을 읽습니다.
+    """
+    response = await get_supabase_client().table("characters").select("version, languages").eq("id", character_id).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Character not found")
+    row = response.data[0]
+    languages = [LanguageProficiency(**language) for language in row.get("languages") or []]
+    cached = persona_compiler.get(character_id, row["version"], persona_compiler.resolve_locale(languages, locale))
+    if cached is not None:
+        return cached
+
+    response = await get_supabase_client().table("characters").select("*").eq("id", character_id).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Character not found")
+    return persona_compiler.compile(CharacterProfile(**response.data[0]), locale)
+
+async def load_catalogue_scope(scope: str) -> str:
+    """
+    캐릭터 목록 범위 하나를 DB에서 읽어 JSON 객체들을 쉼표로 이은 문자열로 반환하는 함수
+
+    :param scope: "{view}:{audience}" - view는 "summary" 또는 "full", audience는 "all", "public", "private:{user_id}"
+    """
+    view, audience = scope.split(":", 1)
+    if view == "summary":
+        query = get_supabase_client().table("characters").select(CharacterSummary.COLUMNS)
+    else:
+        query = get_supabase_client().table("characters").select("*")
+
+    if audience == "public":
+        query = query.eq("is_public", True)
+    elif audience.startswith("private:"):
+        query = query.eq("creator_id", audience.split(":", 1)[1]).eq("is_public", False)
+    # 워커마다 같은 바이트(같은 ETag)가 나오도록 순서를 고정
+    response = await query.order("created_at").order("id").execute()
+
+    if view == "summary":
+        return ",".join(CharacterSummary.from_row(character).model_dump_json() for character in response.data or [])
+    return ",".join(CharacterProfile(**character).model_dump_json() for character in response.data or [])
+
+async def list_characters(current_user: User, view: str = "full") -> CatalogueSnapshot:
+    """
+    사용자가 볼 수 있는 캐릭터 목록 (관리자는 전체, 그 외에는 공개 캐릭터 + 본인이 만든 캐릭터)
+
+    캐시된 직렬화 결과를 반환하므로 DB 조회와 모델 검증은 카탈로그가 바뀐 뒤 처음 한 번만 일어납니다.
+
+    :param view: "summary"이면 목록용 요약(CharacterSummary), "full"이면 전체 프로필(CharacterProfile)
+    """
     try:
         if is_admin(current_user):
-            response = supabase.table("characters").select("*").execute()
-        else:
-            response = supabase.table("characters").select("*").or_(f"creator_id.eq.{current_user.id},is_public.eq.true").execute()
-        
-        if response.data:
-            return [CharacterProfile(**character) for character in response.data]
+            audiences = ["all"]
         else:
-            return []
+            audiences = ["public", f"private:{current_user.id}"]
+        return await character_catalogue.snapshot([f"{view}:{audience}" for audience in audiences], load_catalogue_scope)
     except Exception as e:
         logger.error(f"Error listing characters: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,158 @@
+import json
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List
+
+from app.config import get_redis_client
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class ConversationContextManager: # 대화 컨텍스트 관리자 (대화 하나당 하나)
+    def __init__(self, window_size: int = 10): # window_size: 대화 기록 윈도우 크기
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=window_size) # 최근 메시지 링 버퍼
+        self.relationship_info = {} # 관계 정보
+        self.current_scenario = None # 현재 시나리오
+
+    def add_message(self, role: str, content: Any): # role: 메시지 발신자 역할, content: 메시지 내용
+        if role in ('human', 'ai'):
+            self.messages.append({"role": role, "content": content})
+
+    def get_conversation_history(self) -> List[Dict[str, Any]]:
+        return list(self.messages)
+
+    def update_relationship_info(self, affinity: float, interaction_count: int):
+        self.relationship_info.update({
+            "affinity": affinity,
+            "interaction_count": interaction_count
+        })
+
+    def set_current_scenario(self, scenario: Dict[str, Any]):
+        self.current_scenario = scenario
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "conversation_history": self.get_conversation_history(),
+            "relationship_info": self.relationship_info,
+            "current_scenario": self.current_scenario
+        }
+
+    def get_formatted_context(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def estimated_size(self) -> int:
+        """메모리 상한 계산에 쓰는 대략적인 크기 (바이트)"""
+        return len(json.dumps(self.to_dict(), ensure_ascii=False, default=str))
+
+    def clear_context(self):
+        self.messages.clear()
+        self.relationship_info = {}
+        self.current_scenario = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], window_size: int) -> "ConversationContextManager":
+        context = cls(window_size)
+        for message in data.get("conversation_history", []):
+            context.add_message(message["role"], message["content"])
+        context.relationship_info = data.get("relationship_info") or {}
+        context.current_scenario = data.get("current_scenario")
+        return context
+
+
+class ConversationContextStore:
+    """
+    대화별 컨텍스트(최근 메시지 링 버퍼, 관계 정보, 시나리오)를 보관하는 저장소
+
+    - 대화마다 window_size개의 메시지만 유지
+    - 오래 사용되지 않은 대화부터 제거 (max_conversations, max_bytes 상한)
+    - use_redis=True이면 Redis에 저장해 어느 워커든 같은 대화를 이어서 처리할 수 있음
+      (이 경우 Redis가 원본이며, 로컬 캐시는 Redis를 사용할 수 없을 때만 사용)
+    """
+
+    KEY_PREFIX = "conversation_context"
+
+    def __init__(self, window_size: int = 10, max_conversations: int = 10000, max_bytes: int = 64 * 1024 * 1024, use_redis: bool = False, redis_ttl: int = 60 * 60 * 24):
+        self.window_size = window_size
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self._contexts: "OrderedDict[str, ConversationContextManager]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{conversation_id}"
+
+    def _remember(self, conversation_id: str, context: ConversationContextManager):
+        self._forget(conversation_id)
+        size = context.estimated_size()
+        self._contexts[conversation_id] = context
+        self._sizes[conversation_id] = size
+        self._total_bytes += size
+
+        # 가장 오래 사용되지 않은 대화부터 제거
+        while self._contexts and (len(self._contexts) > self.max_conversations or self._total_bytes > self.max_bytes):
+            evicted_id, _ = self._contexts.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(evicted_id, 0)
+
+    def _forget(self, conversation_id: str):
+        if self._contexts.pop(conversation_id, None) is not None:
+            self._total_bytes -= self._sizes.pop(conversation_id, 0)
+
+    async def get(self, conversation_id: str) -> ConversationContextManager:
+        """대화 컨텍스트를 가져오는 메서드 (없으면 빈 컨텍스트)"""
+        redis_client = get_redis_client() if self.use_redis else None
+        if redis_client is not None:
+            try:
+                cached = await redis_client.get(self._key(conversation_id))
+                if cached:
+                    return ConversationContextManager.from_dict(json.loads(cached), self.window_size)
+                return ConversationContextManager(self.window_size)
+            except Exception as e:
+                logger.warning(f"Context store read failed, using local copy: {str(e)}")
+
+        context = self._contexts.get(conversation_id)
+        if context is None:
+            return ConversationContextManager(self.window_size)
+        self._contexts.move_to_end(conversation_id)
+        return context
+
+    async def save(self, conversation_id: str, context: ConversationContextManager):
+        """대화 컨텍스트를 저장하는 메서드"""
+        redis_client = get_redis_client() if self.use_redis else None
+        if redis_client is not None:
+            try:
+                await redis_client.setex(self._key(conversation_id), self.redis_ttl, json.dumps(context.to_dict(), ensure_ascii=False, default=str))
+                return
+            except Exception as e:
+                logger.warning(f"Context store write failed, keeping local copy: {str(e)}")
+        self._remember(conversation_id, context)
+
+    async def add_message(self, conversation_id: str, role: str, content: Any):
+        context = await self.get(conversation_id)
+        context.add_message(role, content)
+        await self.save(conversation_id, context)
+
+    async def update_relationship_info(self, conversation_id: str, affinity: float, interaction_count: int):
+        context = await self.get(conversation_id)
+        context.update_relationship_info(affinity, interaction_count)
+        await self.save(conversation_id, context)
+
+    async def set_current_scenario(self, conversation_id: str, scenario: Dict[str, Any]):
+        context = await self.get(conversation_id)
+        context.set_current_scenario(scenario)
+        await self.save(conversation_id, context)
+
+    async def clear(self, conversation_id: str):
+        self._forget(conversation_id)
+        redis_client = get_redis_client() if self.use_redis else None
+        if redis_client is not None:
+            try:
+                await redis_client.delete(self._key(conversation_id))
+            except Exception as e:
+                logger.warning(f"Context store delete failed: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"conversations": len(self._contexts), "bytes": self._total_bytes}
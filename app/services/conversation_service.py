@@ -1,22 +1,20 @@
+import asyncio
 import json
 import logging
-import os
+import time
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 
-import tiktoken
 from fastapi import APIRouter, HTTPException
-from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableSequence
-from langchain_openai import OpenAI, ChatOpenAI
+from fastapi.responses import StreamingResponse
 from langchain_core.documents import Document
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain.chains.summarize import load_summarize_chain
-from langchain.chains import LLMChain
-from supabase import Client, create_client
+from starlette.background import BackgroundTask
 
-from app.config import redis_client
+from app.config import (CONTEXT_MAX_BYTES, CONTEXT_MAX_CONVERSATIONS,
+                        CONTEXT_STORE_REDIS, CONTEXT_WINDOW_SIZE,
+                        LLM_STREAM_ACQUIRE_TIMEOUT, RECENT_MESSAGES_CAPACITY,
+                        get_redis_client)
+from app.database import get_supabase_client
 from app.models.conversation import (ConversationCreate, ConversationProfile,
                                      ConversationUpdate, MessageCreate,
                                      MessageProfile)
@@ -24,8 +22,22 @@ from app.models.relationship import (UserCharacterInteractionCreate,
                                      UserCharacterInteractionInDB,
                                      UserCharacterInteractionUpdate)
 from app.models.user import UserProfile as User
-from app.services.ai_service import AIService
+from app.services.ai_service import (AIService, get_llm_semaphore,
+                                     get_llm_stream_semaphore)
+from app.services.auth_service import User as JobUser
+from app.services.chain_registry import get_chain_registry
+from app.services.character_service import get_persona
+from app.services.context_store import ConversationContextStore
+from app.services.job_queue import SummaryJobQueue
+from app.services.prompt_packer import PromptPacker, PromptSection
+from app.services.recent_messages import RecentMessageStore
 from app.services.relationship_service import RelationshipService
+from app.utils.codec import ModelCodec
+from app.utils.embedding_codec import dequantize_embedding, quantize_embedding
+from app.utils.helpers import message_text
+from app.utils.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                                  apply_keyset, encode_cursor)
+from app.utils.read_through import ReadThroughCache
 
 
 router = APIRouter()
@@ -33,110 +45,71 @@ router = APIRouter()
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
-class ConversationContextManager: # 대화 컨텍스트 관리자
-    def __init__(self, window_size: int = 10): # window_size: 대화 기록 윈도우 크기
-        self.memory = ConversationBufferWindowMemory(k=window_size) # 대화 기록 메모리
-        self.relationship_info = {} # 관계 정보
-        self.current_scenario = None # 현재 시나리오
-        
-
-    def add_message(self, role: str, content: str): # role: 메시지 발신자 역할, content: 메시지 내용
-        if role == 'human':
-            self.memory.chat_memory.add_message(HumanMessage(content=content))
-        elif role == 'ai':
-            self.memory.chat_memory.add_message(AIMessage(content=content))
-
-    def get_conversation_history(self) -> List[Dict[str, str]]:
-        return [{"role": msg.type, "content": msg.content} for msg in self.memory.chat_memory.messages]
-
-    def update_relationship_info(self, affinity: float, interaction_count: int):
-        self.relationship_info.update({
-            "affinity": affinity,
-            "interaction_count": interaction_count
-        })
-
-    def set_current_scenario(self, scenario: Dict[str, any]):
-        self.current_scenario = scenario
-
-    def get_formatted_context(self) -> str:
-        context = {
-            "conversation_history": self.get_conversation_history(),
-            "relationship_info": self.relationship_info,
-            "current_scenario": self.current_scenario
-        }
-        return json.dumps(context, ensure_ascii=False, indent=2)
-
-    def clear_context(self):
-        self.memory.clear()
-        self.relationship_info = {}
-        self.current_scenario = None
 
 class ConversationService:
+    # 컨텍스트 소스별 타임아웃 (초)
+    CONTEXT_FETCH_TIMEOUTS = {
+        "recent_messages": 2.0,
+        "summary": 1.0,
+        "similar_messages": 1.5,
+        "relationship": 2.0,
+        "persona": 1.0,
+    }
+
+    # 프롬프트 섹션별 토큰 예산
+    PROMPT_TOKEN_BUDGETS = {
+        "recent_messages": 1200,
+        "summary": 400,
+        "context": 800,
+        "similar_messages": 400,
+    }
+
+    # 메시지 조회 시 가져올 컬럼 (임베딩 제외)
+    MESSAGE_COLUMNS = "id, conversation_id, sender_type, content, metadata, created_at"
+
+    # 메시지 카운터 유효 시간 (초), 만료되면 DB에서 다시 세어 보정
+    MESSAGE_COUNT_TTL = 60 * 60 * 24
+
+    # 키가 있을 때만 INCR (없으면 nil을 반환해 DB에서 초기화하도록 함)
+    INCR_IF_EXISTS_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        local count = redis.call('INCR', KEYS[1])
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+        return count
+    end
+    return nil
+    """
+
     def __init__(self):
-        self.context_manager = ConversationContextManager()
-        self.llm = OpenAI(temperature=0)  # OpenAI 모델 초기화
-        self.summarize_chain = load_summarize_chain(self.llm, chain_type="map_reduce")
+        self.context_store = ConversationContextStore(
+            window_size=CONTEXT_WINDOW_SIZE,
+            max_conversations=CONTEXT_MAX_CONVERSATIONS,
+            max_bytes=CONTEXT_MAX_BYTES,
+            use_redis=CONTEXT_STORE_REDIS
+        )
+        self.prompt_packer = PromptPacker()
+        self.chains = get_chain_registry()
         self.ai_service = AIService()
-        
         self.relationship_service = RelationshipService()
-        self.llm = ChatOpenAI(temperature=0.7)
-        self.prompt_template = PromptTemplate(
-            input_variables=["context", "recent_messages", "summary", "similar_messages", "affinity", "nickname"],
-            template="""
-            당신은 AI 연인입니다. 다음 정보를 바탕으로 대화에 참여하세요:
-            
-            대화 컨텍스트: {context}
-            최근 메시지들: {recent_messages}
-            대화 요약: {summary}
-            유사한 메시지들: {similar_messages}
-            호감도 (태도 참고용): {affinity}
-            사용자가 부르는 호칭: {nickname}
-            
-            위 정보를 참고하여 자연스럽고 개성 있는 답변을 생성하세요. 호감도에 따라 태도를 적절히 조절하세요.
-            """
-        )
-        self.llm_chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
-
-        self.relationship_service = RelationshipService()
-        self.llm = ChatOpenAI(temperature=0.7)
-        self.affinity_prompt = PromptTemplate(
-            input_variables=["summary"],
-            template="""
-            다음은 대화의 요약입니다:
-            {summary}
-            
-            이 대화 요약을 바탕으로, AI 캐릭터의 사용자에 대한 호감도 변화를 평가해주세요.
-            호감도 변화를 -5에서 5 사이의 숫자로 표현해주세요. 
-            -5는 AI 캐릭터가 사용자에 대해 매우 부정적인 변화를 느낌, 0은 변화 없음, 5는 매우 긍정적인 변화를 느낌을 의미합니다.
-            
-            호감도 변화 점수:
-            """
-        )
-        self.affinity_chain = LLMChain(llm=self.llm, prompt=self.affinity_prompt)
-
-        self.redis_client = redis_client
+        self.summary_queue = SummaryJobQueue()
+        # 대화 / 최신 요약 읽기 캐시 (1시간, 없음은 1분)
+        conversation_codec = ModelCodec(ConversationProfile)
+        self.conversation_cache = ReadThroughCache("conversation", encode=conversation_codec.encode, decode=conversation_codec.decode)
+        self.summary_cache = ReadThroughCache("conversation_summary")
+        self.recent_messages = RecentMessageStore(capacity=RECENT_MESSAGES_CAPACITY)
 
 
 
     async def summarize_conversation(self, conversation_id: str, current_user: User) -> str:
-        # 대화 내용 가져오기
-        messages = await self.list_messages(conversation_id, current_user)
-        
-        # 최근 10개의 메시지만 선택
-        recent_messages = messages[-10:]
+        # 대화 내용 가져오기 (최근 10개의 메시지만)
+        recent_messages = await self.list_messages(conversation_id, current_user, limit=10)
         
         # 메시지를 Document 객체로 변환
-        docs = [Document(page_content=msg.content) for msg in recent_messages]
+        docs = [Document(page_content=message_text(msg.content)) for msg in recent_messages]
         
         # 요약 생성
-        summary = self.summarize_chain.run(docs)
+        async with get_llm_semaphore():
+            summary = await self.chains.summarize_chain.arun(docs)
         
         # 요약 결과 저장
         await self.save_summary(conversation_id, summary)
@@ -150,6 +123,23 @@ class ConversationService:
         
         return summary
 
+    @property
+    def redis_client(self):
+        # lifespan에서 생성된 asyncio Redis 클라이언트
+        return get_redis_client()
+
+    async def process_summary_job(self, job: Dict[str, Any]) -> str:
+        """
+        요약 작업 큐에서 꺼낸 작업을 처리하는 메서드 (워커에서 호출)
+
+        :param job: conversation_id, user_id, email을 담은 작업
+        :return: 생성된 요약
+        """
+        job_user = JobUser(id=job["user_id"], email=job.get("email") or "")
+        summary = await self.summarize_conversation(job["conversation_id"], job_user)
+        await self.reconcile_message_count(job["conversation_id"])
+        return summary
+
     async def save_summary(self, conversation_id: str, summary: str):
         """
         생성된 요약을 저장하는 메서드
@@ -159,7 +149,7 @@ class ConversationService:
         """
         try:
             # Supabase에 요약 저장
-            response = supabase.table("conversation_summaries").insert({
+            response = await get_supabase_client().table("conversation_summaries").insert({
                 "conversation_id": conversation_id,
                 "summary": summary,
                 "created_at": datetime.now(timezone.utc).isoformat()
@@ -167,6 +157,7 @@ class ConversationService:
             
             if not response.data:
                 raise HTTPException(status_code=400, detail="Failed to save summary")
+            await self.summary_cache.set(conversation_id, summary)
         except Exception as e:
             logger.error(f"Error saving summary: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -174,11 +165,11 @@ class ConversationService:
     async def create_message_and_respond(self, conversation_id: str, message: MessageCreate, current_user: User) -> MessageProfile:
         created_message = await self.create_message(conversation_id, message, current_user)
         
-        if message.sender == "user":
+        if message.sender_type == "user":
             conversation = await self.get_conversation(conversation_id, current_user)
-            ai_response = await self.generate_ai_response(conversation_id, str(current_user.id), str(conversation.character_id))
+            ai_response = await self.generate_ai_response(conversation_id, str(current_user.id), str(conversation.character_id), message_text(message.content))
             
-            ai_message = MessageCreate(sender="character", content=ai_response)
+            ai_message = MessageCreate(conversation_id=conversation_id, sender_type="character", content=[{"type": "text", "text": ai_response}])
             await self.create_message(conversation_id, ai_message, current_user)
         
         return created_message
@@ -189,11 +180,12 @@ class ConversationService:
             conversation_data['user_id'] = str(current_user.id)
             conversation_data['character_id'] = str(conversation.character_id)
             
-            response = supabase.table("conversations").insert(conversation_data).execute()
+            response = await get_supabase_client().table("conversations").insert(conversation_data).execute()
             
             if response.data:
-                self.context_manager.clear_context()
-                return ConversationProfile(**response.data[0])
+                created_conversation = ConversationProfile(**response.data[0])
+                await self.context_store.clear(str(created_conversation.id))
+                return created_conversation
             else:
                 raise HTTPException(status_code=400, detail="Failed to create conversation")
         except Exception as e:
@@ -202,30 +194,23 @@ class ConversationService:
         
 
     async def get_conversation(self, conversation_id: str, current_user: User) -> ConversationProfile:
-        # Redis에서 먼저 확인
-        cached_conversation = self.redis_client.get(f"conversation:{conversation_id}")
-        if cached_conversation:
-            conversation = json.loads(cached_conversation)
-            if conversation['user_id'] == current_user.id:
-                return ConversationProfile(**conversation)
-        
-        # Redis에 없으면 데이터베이스에서 조회
         try:
-            response = supabase.table("conversations").select("*").eq("id", conversation_id).execute()
-            if response.data:
-                conversation = response.data[0]
-                if conversation['user_id'] == current_user.id:
-                    # Redis에 캐시 저장
-                    self.redis_client.setex(f"conversation:{conversation_id}", 3600, json.dumps(conversation))  # 1시간 동안 캐시
-                    return ConversationProfile(**conversation)
-                else:
-                    raise HTTPException(status_code=403, detail="You don't have permission to access this conversation")
+            # Redis에서 먼저 확인 (없으면 데이터베이스에서 조회해 캐시)
+            conversation = await self.conversation_cache.get(conversation_id, lambda: self.get_conversation_from_db(conversation_id))
+            if conversation.user_id == current_user.id:
+                return conversation
             else:
-                raise HTTPException(status_code=404, detail="Conversation not found")
+                raise HTTPException(status_code=403, detail="You don't have permission to access this conversation")
         except Exception as e:
             logger.error(f"Error getting conversation: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def get_conversation_from_db(self, conversation_id: str) -> ConversationProfile:
+        response = await get_supabase_client().table("conversations").select("*").eq("id", conversation_id).execute()
+        if response.data:
+            return ConversationProfile(**response.data[0])
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
     async def update_conversation(self, conversation_id: str, conversation: ConversationUpdate, current_user: User) -> ConversationProfile:
         try:
             existing_conversation = await self.get_conversation(conversation_id, current_user)
@@ -234,9 +219,11 @@ class ConversationService:
             
             update_data = conversation.model_dump(exclude_unset=True)
             
-            response = supabase.table("conversations").update(update_data).eq("id", conversation_id).execute()
+            response = await get_supabase_client().table("conversations").update(update_data).eq("id", conversation_id).execute()
             if response.data:
-                return ConversationProfile(**response.data[0])
+                updated_conversation = ConversationProfile(**response.data[0])
+                await self.conversation_cache.set(conversation_id, updated_conversation)
+                return updated_conversation
             else:
                 raise HTTPException(status_code=400, detail="Failed to update conversation")
         except Exception as e:
@@ -249,25 +236,53 @@ class ConversationService:
             if existing_conversation.user_id != current_user.id:
                 raise HTTPException(status_code=403, detail="You don't have permission to delete this conversation")
             
-            response = supabase.table("conversations").delete().eq("id", conversation_id).execute()
+            response = await get_supabase_client().table("conversations").delete().eq("id", conversation_id).execute()
             if not response.data:
                 raise HTTPException(status_code=400, detail="Failed to delete conversation")
+            await self.conversation_cache.delete(conversation_id)
+            await self.recent_messages.clear(conversation_id)
+            await self.context_store.clear(conversation_id)
         except Exception as e:
             logger.error(f"Error deleting conversation: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def list_conversations(self, current_user: User) -> List[ConversationProfile]:
+    async def list_conversations(self, current_user: User, before: Optional[str] = None, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, oldest_first: bool = False) -> List[ConversationProfile]:
+        """
+        사용자의 대화 목록을 (created_at, id) 키셋 페이지 단위로 반환하는 메서드 (오래된 순)
+
+        :param before: 이 커서보다 오래된 대화
+        :param after: 이 커서보다 새로운 대화
+        :param limit: 페이지 크기
+        :param oldest_first: 커서가 없을 때 가장 오래된 대화부터 반환
+        """
         try:
-            response = supabase.table("conversations").select("*").eq("user_id", current_user.id).execute()
+            query = get_supabase_client().table("conversations").select("*").eq("user_id", current_user.id)
+            query, reverse = apply_keyset(query, before, after, limit, oldest_first)
+            response = await query.execute()
             
             if response.data:
-                return [ConversationProfile(**conversation) for conversation in response.data]
+                rows = response.data[::-1] if reverse else response.data
+                return [ConversationProfile(**conversation) for conversation in rows]
             else:
                 return []
         except Exception as e:
             logger.error(f"Error listing conversations: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def stream_conversations(self, current_user: User) -> StreamingResponse:
+        """사용자의 모든 대화를 페이지 단위로 읽어 NDJSON으로 스트리밍하는 메서드"""
+        async def ndjson_stream() -> AsyncIterator[str]:
+            after = None
+            while True:
+                page = await self.list_conversations(current_user, after=after, limit=MAX_PAGE_SIZE, oldest_first=True)
+                for conversation in page:
+                    yield conversation.model_dump_json() + "\n"
+                if len(page) < MAX_PAGE_SIZE:
+                    break
+                after = encode_cursor(page[-1].created_at, page[-1].id)
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
     async def create_message(self, conversation_id: str, message: MessageCreate, current_user: User) -> MessageProfile:
         try:
             await self.get_conversation(conversation_id, current_user)
@@ -275,36 +290,37 @@ class ConversationService:
             message_data = message.model_dump()
             message_data['conversation_id'] = conversation_id
             
-            self.context_manager.add_message("human" if message.sender == "user" else "ai", message.content)
+            await self.context_store.add_message(conversation_id, "human" if message.sender_type == "user" else "ai", message.content)
             
-            # 메시지 생성 후 메시지 개수 확인
-            message_count = await self.get_message_count(conversation_id)
-            # 메시지 개수가 10의 배수일 때 요약 생성
-            if message_count % 10 == 0:
-                await self.summarize_conversation(conversation_id, current_user)
-
             # 메시지 내용 벡터화
-            vector = self.ai_service.vectorize_text(message.content)
-            message_data['embedding'] = vector
+            text = message_text(message.content)
+            vector = await self.ai_service.vectorize_text(text)
+            # JSON float 배열 대신 int8로 양자화한 bytea로 저장 (조회는 get_message_embedding)
+            message_data['embedding_q8'] = quantize_embedding(vector)
 
-            
             # Supabase에 메시지 저장 (벡터 포함)
-            response = supabase.table("messages").insert(message_data).execute()
+            response = await get_supabase_client().table("messages").insert(message_data).execute()
             
             if response.data:
                 created_message = MessageProfile(**response.data[0])
+
+                # 메시지 생성 후 메시지 개수 확인 (Redis 카운터)
+                message_count = await self.increment_message_count(conversation_id)
+                # 메시지 개수가 10의 배수일 때 요약 생성
+                if message_count % 10 == 0:
+                    # 요약과 호감도 계산은 워커가 처리하도록 큐에 넣음 (python -m app.worker)
+                    await self.summary_queue.enqueue(conversation_id, str(current_user.id), getattr(current_user, "email", ""))
                 
-                # Redis에 최근 메시지 캐시
-                self.redis_client.lpush(f"recent_messages:{conversation_id}", json.dumps(created_message.dict()))
-                self.redis_client.ltrim(f"recent_messages:{conversation_id}", 0, 9)  # 최근 10개 메시지만 유지
+                # Redis 최근 메시지 링 버퍼에 추가 (한 번의 왕복으로 추가와 자르기)
+                await self.recent_messages.push(conversation_id, created_message)
 
-                # Pinecone에 벡터 저장
+                # 벡터 저장소에 저장 (백그라운드에서 묶어서 upsert)
                 await self.ai_service.store_vector_async(
                     id=str(created_message.id),
                     vector=vector,
                     metadata={
                         "conversation_id": conversation_id,
-                        "content": message.content,
+                        "content": text,
                         "created_at": created_message.created_at.isoformat()
                     }
                 )
@@ -319,57 +335,127 @@ class ConversationService:
     
     async def get_similar_messages(self, conversation_id: str, message_content: str, top_k: int = 5) -> List[MessageProfile]:
         """
-        특정 대화 내에서 유사한 메시지를 검색하는 메서드
+        특정 대화 내에서 유사한 메시지를 검색하는 메서드 (권한 확인 없음, 호출하는 쪽에서 확인)
         
         :param conversation_id: 검색 대상 대화 ID
         :param message_content: 검색할 메시지 내용
         :param top_k: 반환할 최대 결과 수
-        :return: 유사한 메시지들의 정보
+        :return: 유사한 메시지들의 정보 (유사도 순)
         """
-        vector = self.ai_service.vectorize_text(message_content)
-        similar_vectors = self.ai_service.search_similar_vectors(vector, conversation_id, top_k)
-        
-        similar_messages = []
-        for match in similar_vectors:
-            message_id = match['id']
-            message = await self.get_message(message_id, None)  # 여기서 None은 임시로 사용. 실제로는 적절한 권한 체크가 필요합니다.
-            similar_messages.append(message)
-        
-        return similar_messages
+        vector = await self.ai_service.vectorize_text(message_content)
+        similar_vectors = await self.ai_service.search_similar_vectors(vector, conversation_id, top_k)
+        ids = [match['id'] for match in similar_vectors]
+        if not ids:
+            return []
+
+        # 찾은 메시지를 대화 범위 안에서 한 번에 조회
+        response = await get_supabase_client().table("messages").select(self.MESSAGE_COLUMNS).eq("conversation_id", conversation_id).in_("id", ids).execute()
+        messages = {str(row['id']): MessageProfile(**row) for row in response.data}
+        return [messages[id] for id in ids if id in messages]
     
+    def _message_count_key(self, conversation_id: str) -> str:
+        return f"message_count:{conversation_id}"
+
+    async def count_messages_in_db(self, conversation_id: str) -> int:
+        """DB에서 대화의 메시지 개수를 직접 세는 메서드 (카운터 초기화/보정용)"""
+        response = await get_supabase_client().table("messages").select("id", count="exact").eq("conversation_id", conversation_id).execute()
+        return response.count or 0
+
     async def get_message_count(self, conversation_id: str) -> int:
         """
         특정 대화의 메시지 개수를 반환하는 메서드
         
+        Redis 카운터를 우선 사용하고, 없을 때만 DB에서 세어 카운터를 초기화합니다.
+
         :param conversation_id: 대화 ID
         :return: 메시지 개수
         """
         try:
-            response = supabase.table("messages").select("id", count="exact").eq("conversation_id", conversation_id).execute()
-            return response.count
+            cached_count = await self.redis_client.get(self._message_count_key(conversation_id))
+            if cached_count is not None:
+                return int(cached_count)
+
+            count = await self.count_messages_in_db(conversation_id)
+            await self.redis_client.set(self._message_count_key(conversation_id), count, ex=self.MESSAGE_COUNT_TTL, nx=True)
+            return count
         except Exception as e:
             logger.error(f"Error getting message count: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def increment_message_count(self, conversation_id: str) -> int:
+        """
+        메시지 저장 직후 대화의 메시지 카운터를 원자적으로 1 증가시키는 메서드
 
+        카운터가 없으면(처음이거나 만료됨) 방금 저장한 메시지를 포함한 DB 개수로 초기화합니다.
 
-    async def list_messages(self, conversation_id: str, current_user: User) -> List[MessageProfile]:
+        :param conversation_id: 대화 ID
+        :return: 증가된 메시지 개수
+        """
+        key = self._message_count_key(conversation_id)
+        count = await self.redis_client.eval(self.INCR_IF_EXISTS_SCRIPT, 1, key, self.MESSAGE_COUNT_TTL)
+        if count is not None:
+            return int(count)
+
+        count = await self.count_messages_in_db(conversation_id)
+        if not await self.redis_client.set(key, count, ex=self.MESSAGE_COUNT_TTL, nx=True):
+            # 다른 요청이 먼저 초기화함
+            return int(await self.redis_client.get(key) or count)
+        return count
+
+    async def reconcile_message_count(self, conversation_id: str) -> int:
+        """Redis 카운터를 DB의 실제 메시지 개수로 맞추는 메서드 (요약 작업 시 호출)"""
+        count = await self.count_messages_in_db(conversation_id)
+        await self.redis_client.set(self._message_count_key(conversation_id), count, ex=self.MESSAGE_COUNT_TTL)
+        return count
+
+    async def list_messages(self, conversation_id: str, current_user: User, before: Optional[str] = None, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, check_access: bool = True, oldest_first: bool = False) -> List[MessageProfile]:
+        """
+        대화의 메시지를 (created_at, id) 키셋 페이지 단위로 반환하는 메서드 (오래된 순)
+
+        커서가 없으면 최신 limit개를 반환합니다 (oldest_first이면 가장 오래된 limit개).
+
+        :param before: 이 커서보다 오래된 메시지
+        :param after: 이 커서보다 새로운 메시지
+        :param limit: 페이지 크기
+        :param check_access: False이면 대화 접근 권한 확인을 생략 (이미 확인한 경우)
+        :param oldest_first: 커서가 없을 때 가장 오래된 메시지부터 반환
+        """
         try:
-            await self.get_conversation(conversation_id, current_user)
+            if check_access:
+                await self.get_conversation(conversation_id, current_user)
             
-            response = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("created_at").execute()
+            query = get_supabase_client().table("messages").select(self.MESSAGE_COLUMNS).eq("conversation_id", conversation_id)
+            query, reverse = apply_keyset(query, before, after, limit, oldest_first)
+            response = await query.execute()
             
             if response.data:
-                return [MessageProfile(**message) for message in response.data]
+                rows = response.data[::-1] if reverse else response.data
+                return [MessageProfile(**message) for message in rows]
             else:
                 return []
         except Exception as e:
             logger.error(f"Error listing messages: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def stream_messages(self, conversation_id: str, current_user: User) -> StreamingResponse:
+        """대화의 모든 메시지를 오래된 순으로 페이지 단위로 읽어 NDJSON으로 스트리밍하는 메서드"""
+        await self.get_conversation(conversation_id, current_user)
+
+        async def ndjson_stream() -> AsyncIterator[str]:
+            after = None
+            while True:
+                page = await self.list_messages(conversation_id, current_user, after=after, limit=MAX_PAGE_SIZE, check_access=False, oldest_first=True)
+                for message in page:
+                    yield message.model_dump_json() + "\n"
+                if len(page) < MAX_PAGE_SIZE:
+                    break
+                after = encode_cursor(page[-1].created_at, page[-1].id)
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
     async def get_message(self, message_id: str, current_user: User) -> MessageProfile:
         try:
-            response = supabase.table("messages").select("*").eq("id", message_id).execute()
+            response = await get_supabase_client().table("messages").select(self.MESSAGE_COLUMNS).eq("id", message_id).execute()
             if response.data:
                 message = response.data[0]
                 conversation = await self.get_conversation(message['conversation_id'], current_user)
@@ -382,18 +468,40 @@ class ConversationService:
             logger.error(f"Error getting message: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def update_relationship(self, user_id: str, character_id: str, affinity: float, interaction_count: int):
+    async def get_message_embedding(self, message_id: str, current_user: User) -> List[float]:
+        """
+        메시지의 임베딩만 따로 조회하는 메서드 (기본 메시지 조회에는 임베딩이 포함되지 않음)
+
+        int8로 양자화된 embedding_q8을 우선 사용하고, 이전에 저장된 메시지는 JSON 배열(embedding)을 사용합니다.
+        """
+        try:
+            response = await get_supabase_client().table("messages").select("conversation_id, embedding_q8, embedding").eq("id", message_id).execute()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Message not found")
+            message = response.data[0]
+            conversation = await self.get_conversation(message['conversation_id'], current_user)
+            if conversation.user_id != current_user.id:
+                raise HTTPException(status_code=403, detail="You don't have permission to access this message")
+            embedding = dequantize_embedding(message.get('embedding_q8')) or message.get('embedding')
+            if embedding is None:
+                raise HTTPException(status_code=404, detail="Message embedding not found")
+            return embedding
+        except Exception as e:
+            logger.error(f"Error getting message embedding: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def update_relationship(self, conversation_id: str, affinity: float, interaction_count: int):
         try:
-            self.context_manager.update_relationship_info(affinity, interaction_count)
+            await self.context_store.update_relationship_info(conversation_id, affinity, interaction_count)
             # 여기에 데이터베이스 업데이트 로직 추가
         except Exception as e:
             logger.error(f"Error updating relationship: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def set_scenario(self, scenario_id: str):
+    async def set_scenario(self, conversation_id: str, scenario_id: str):
         try:
             scenario = await self.get_scenario_from_db(scenario_id)
-            self.context_manager.set_current_scenario(scenario)
+            await self.context_store.set_current_scenario(conversation_id, scenario)
         except Exception as e:
             logger.error(f"Error setting scenario: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -401,52 +509,44 @@ class ConversationService:
     async def get_scenario_from_db(self, scenario_id: str):
         # 데이터베이스에서 시나리오 정보를 가져오는 로직 구현
         # 예시:
-        response = supabase.table("scenarios").select("*").eq("id", scenario_id).execute()
+        response = await get_supabase_client().table("scenarios").select("*").eq("id", scenario_id).execute()
         if response.data:
             return response.data[0]
         else:
             raise HTTPException(status_code=404, detail="Scenario not found")
 
     async def get_conversation_summary(self, conversation_id: str) -> str:
-        # Redis에서 먼저 확인
-        cached_summary = self.redis_client.get(f"conversation_summary:{conversation_id}")
-        if cached_summary:
-            return cached_summary
-        
-        # Redis에 없으면 데이터베이스에서 조회
         try:
-            response = supabase.table("conversation_summaries").select("summary").eq("conversation_id", conversation_id).order("created_at", ascending=False).limit(1).execute()
-            if response.data:
-                summary = response.data[0]['summary']
-                # Redis에 캐시 저장
-                self.redis_client.setex(f"conversation_summary:{conversation_id}", 3600, summary)  # 1시간 동안 캐시
-                return summary
-            return "아직 요약이 없습니다."
+            # Redis에서 먼저 확인 (없으면 데이터베이스에서 조회해 캐시, 요약이 없다는 결과도 잠시 캐시)
+            return await self.summary_cache.get(conversation_id, lambda: self.get_conversation_summary_from_db(conversation_id))
+        except HTTPException as e:
+            if e.status_code == 404:
+                return "아직 요약이 없습니다."
+            logger.error(f"Error getting conversation summary: {str(e)}")
+            return "요약을 가져오는 데 실패했습니다."
         except Exception as e:
             logger.error(f"Error getting conversation summary: {str(e)}")
             return "요약을 가져오는 데 실패했습니다."
 
+    async def get_conversation_summary_from_db(self, conversation_id: str) -> str:
+        response = await get_supabase_client().table("conversation_summaries").select("summary").eq("conversation_id", conversation_id).order("created_at", desc=True).limit(1).execute()
+        if response.data:
+            return response.data[0]['summary']
+        raise HTTPException(status_code=404, detail="Summary not found")
+
     async def get_recent_messages(self, conversation_id: str, limit: int) -> List[MessageProfile]:
-        # Redis에서 최근 메시지 조회
-        cached_messages = self.redis_client.lrange(f"recent_messages:{conversation_id}", 0, limit - 1)
-        if cached_messages and len(cached_messages) == limit:
-            return [MessageProfile(**json.loads(msg)) for msg in cached_messages]
-        
-        # Redis에 없으면 데이터베이스에서 조회
+        # Redis 링 버퍼에서 최근 메시지 조회 (부족하면 DB에서 한 번에 채움)
         try:
-            response = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("created_at", ascending=False).limit(limit).execute()
-            messages = [MessageProfile(**msg) for msg in response.data][::-1]
-            
-            # Redis에 캐시 저장
-            for msg in messages:
-                self.redis_client.lpush(f"recent_messages:{conversation_id}", json.dumps(msg.model_dump()))
-            self.redis_client.ltrim(f"recent_messages:{conversation_id}", 0, limit - 1)
-            
-            return messages
+            return await self.recent_messages.get(conversation_id, limit, lambda n: self.get_recent_messages_from_db(conversation_id, n))
         except Exception as e:
             logger.error(f"Error getting recent messages: {str(e)}")
             return []
 
+    async def get_recent_messages_from_db(self, conversation_id: str, limit: int) -> List[MessageProfile]:
+        """최근 limit개의 메시지를 오래된 순으로 반환하는 메서드"""
+        response = await get_supabase_client().table("messages").select(self.MESSAGE_COLUMNS).eq("conversation_id", conversation_id).order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+        return [MessageProfile(**msg) for msg in response.data][::-1]
+
 
     async def get_relationship(self, character_id: str, user_id: str) -> UserCharacterInteractionInDB:
         try:
@@ -456,69 +556,253 @@ class ConversationService:
             new_relationship = UserCharacterInteractionCreate(character_id=character_id, user_id=user_id)
             return await self.relationship_service.create_interaction(new_relationship)
 
-    async def generate_ai_response(self, conversation_id: str, user_id: str, character_id: str) -> str:
+    async def _timed_fetch(self, name: str, coro: Awaitable[Any], latencies: Dict[str, float], fallback: Any = None, required: bool = False) -> Any:
+        """
+        컨텍스트 소스 하나를 타임아웃과 함께 가져오고 소요 시간(ms)을 기록하는 메서드
+
+        :param name: 소스 이름 (CONTEXT_FETCH_TIMEOUTS의 키)
+        :param coro: 실행할 코루틴
+        :param latencies: 소스별 소요 시간을 기록할 딕셔너리
+        :param fallback: 실패하거나 시간 초과 시 반환할 기본값
+        :param required: True이면 실패 시 예외를 그대로 전달
+        """
+        started = time.perf_counter()
         try:
-            recent_messages = await self.get_recent_messages(conversation_id, 10)
-            summary = await self.get_conversation_summary(conversation_id)
-            similar_messages = await self.get_similar_messages(conversation_id, recent_messages[-1].content, 3)
-            relationship = await self.relationship_service.get_interaction(user_id, character_id)
-            affinity_level = self.relationship_service.get_affinity_level(relationship.affinity)
-
-            # 컨텍스트 업데이트
-            self.context_manager.update_relationship_info(relationship.affinity, relationship.interaction_count)
-            self.context_manager.add_message("human", recent_messages[-1].content)
-
-            context = self.context_manager.get_formatted_context()
-
-            # 토큰 수 계산 및 제한
-            encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-            max_tokens = 4096  # GPT-3.5-turbo의 최대 토큰 수
-            prompt_tokens = len(encoding.encode(context))
-            available_tokens = max_tokens - prompt_tokens - 100  # 응답을 위한 여유 토큰
-            
-            prompt_template = PromptTemplate(
-                input_variables=["recent_messages", "summary", "similar_messages", "affinity_level", "relationship_type", "nickname"],
-                template="""
-                당신은 AI 캐릭터입니다. 다음 정보를 바탕으로 사용자와의 대화에 참여하세요:
-                
-                컨텍스트: {context}
-                최근 메시지들: {recent_messages}
-                대화 요약: {summary}
-                유사한 과거 메시지들: {similar_messages}
-                사용자에 대한 호감도: {affinity_level}
-                사용자와의 관계: {relationship_type}
-                사용자의 별명: {nickname}
-                
-                위 정보를 참고하여 자연스럽고 개성 있는 답변을 생성하세요. 
-                호감도와 관계 유형에 맞는 적절한 어조와 친밀도를 사용하세요.
-                이전 대화 내용과 일관성을 유지하면서, 대화를 발전시키는 답변을 제공하세요.
-                """
-            )
-
-            llm = ChatOpenAI(temperature=0.7, max_tokens=available_tokens)
-            llm_chain = LLMChain(llm=llm, prompt=prompt_template)
+            return await asyncio.wait_for(coro, self.CONTEXT_FETCH_TIMEOUTS[name])
+        except Exception as e:
+            if required:
+                raise
+            logger.warning(f"Context source '{name}' skipped: {type(e).__name__} {str(e)}")
+            return fallback
+        finally:
+            latencies[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def gather_response_context(self, conversation_id: str, user_id: str, character_id: str, query_text: Optional[str] = None) -> Dict[str, Any]:
+        """
+        AI 응답에 필요한 컨텍스트(최근 메시지, 요약, 유사 메시지, 관계 정보, 캐릭터 페르소나)를 동시에 가져오는 메서드
+
+        각 소스는 개별 타임아웃을 가지며, 관계 정보를 제외한 소스는 실패 시 기본값으로 대체됩니다.
+        관계 정보 조회가 실패하면 아직 진행 중인 다른 조회는 취소하고 예외를 그대로 전달합니다.
+        query_text가 없으면 유사 메시지 검색은 최근 메시지의 마지막 내용을 기다렸다가 사용합니다.
+
+        :param conversation_id: 대화 ID
+        :param user_id: 사용자 ID
+        :param character_id: 캐릭터 ID
+        :param query_text: 유사 메시지 검색에 사용할 내용 (보통 방금 받은 사용자 메시지)
+        :return: 소스별 결과와 소스별 소요 시간(latencies, ms)
+        """
+        latencies: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        recent_task = asyncio.ensure_future(self._timed_fetch(
+            "recent_messages", self.get_recent_messages(conversation_id, 10), latencies, fallback=[]
+        ))
+
+        async def fetch_similar_messages() -> List[MessageProfile]:
+            text = query_text
+            if text is None:
+                recent_messages = await asyncio.shield(recent_task)
+                if not recent_messages:
+                    return []
+                text = message_text(recent_messages[-1].content)
+            return await self.get_similar_messages(conversation_id, text, 3)
+
+        tasks = [recent_task] + [asyncio.ensure_future(fetch) for fetch in (
+            self._timed_fetch("summary", self.get_conversation_summary(conversation_id), latencies, fallback="아직 요약이 없습니다."),
+            self._timed_fetch("similar_messages", fetch_similar_messages(), latencies, fallback=[]),
+            self._timed_fetch("relationship", self.relationship_service.get_interaction(character_id, user_id), latencies, required=True),
+            self._timed_fetch("persona", get_persona(character_id), latencies),
+        )]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in tasks:
+                if task in done and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            # 필수 소스가 실패했거나 호출이 취소되면 남은 조회(임베딩, 페르소나 등)도 함께 취소
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        recent_messages, summary, similar_messages, relationship, persona = [task.result() for task in tasks]
+
+        latencies["total"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.debug(f"Context gathered for conversation {conversation_id}: {latencies}")
+
+        return {
+            "recent_messages": recent_messages,
+            "summary": summary,
+            "similar_messages": similar_messages,
+            "relationship": relationship,
+            "persona": persona,
+            "latencies": latencies
+        }
+
+    async def prepare_ai_response(self, conversation_id: str, user_id: str, character_id: str, query_text: Optional[str] = None) -> Tuple[int, Dict[str, str]]:
+        """
+        AI 응답 생성에 필요한 최대 토큰 수와 프롬프트 입력값을 준비하는 메서드
+
+        :param conversation_id: 대화 ID
+        :param user_id: 사용자 ID
+        :param character_id: 캐릭터 ID
+        :param query_text: 방금 받은 사용자 메시지 내용
+        :return: (응답에 사용할 최대 토큰 수, 프롬프트 입력값)
+        """
+        gathered = await self.gather_response_context(conversation_id, user_id, character_id, query_text)
+        recent_messages = gathered["recent_messages"]
+        summary = gathered["summary"]
+        similar_messages = gathered["similar_messages"]
+        relationship = gathered["relationship"]
+        persona = gathered["persona"]
+        affinity_level = self.relationship_service.get_affinity_level(relationship.affinity)
+
+        # 컨텍스트 업데이트 (사용자 메시지는 create_message에서 이미 추가됨)
+        context_manager = await self.context_store.get(conversation_id)
+        context_manager.update_relationship_info(relationship.affinity, relationship.interaction_count)
+        await self.context_store.save(conversation_id, context_manager)
+
+        context = context_manager.get_formatted_context()
+
+        fixed_inputs = {
+            "affinity_level": affinity_level,
+            "relationship_type": relationship.relationship_type.value,
+            "nickname": relationship.nickname or "사용자"
+        }
+
+        # 섹션별 토큰 예산 적용 (우선순위가 낮은 섹션부터 줄임)
+        budgets = self.PROMPT_TOKEN_BUDGETS
+        packed, available_tokens = self.prompt_packer.pack(
+            [self.chains.prompts["reply"].template, *fixed_inputs.values()],
+            [
+                PromptSection("recent_messages", [self.format_message(msg) for msg in recent_messages], budgets["recent_messages"], priority=3, keep_last=True),
+                PromptSection("summary", [summary], budgets["summary"], priority=2),
+                PromptSection("context", [context], budgets["context"], priority=1),
+                PromptSection("similar_messages", [self.format_message(msg) for msg in similar_messages], budgets["similar_messages"], priority=0),
+            ],
+            # 페르소나는 토큰 수가 함께 캐시되어 있으므로 다시 세지 않음
+            reserved_tokens=persona.tokens if persona else 0
+        )
+
+        inputs = {**packed, **fixed_inputs, "persona": persona.text if persona else ""}
+        return available_tokens, inputs
+
+    async def generate_ai_response(self, conversation_id: str, user_id: str, character_id: str, query_text: Optional[str] = None) -> str:
+        try:
+            available_tokens, inputs = await self.prepare_ai_response(conversation_id, user_id, character_id, query_text)
             
-            ai_response = llm_chain.run(
-                context=context,
-                recent_messages=self.format_messages(recent_messages),
-                summary=summary,
-                similar_messages=self.format_messages(similar_messages),
-                affinity_level=affinity_level,
-                relationship_type=relationship.relationship_type.value,
-                nickname=relationship.nickname or "사용자"
-            )
-
-            # AI 응답을 컨텍스트에 추가
-            self.context_manager.add_message("ai", ai_response)
+            async with get_llm_semaphore():
+                ai_response = await self.chains.reply_chain(available_tokens).ainvoke(inputs)
             
             return ai_response
         except Exception as e:
             logger.error(f"Error generating AI response: {str(e)}")
             return "죄송합니다. 응답을 생성하는 데 문제가 발생했습니다. 다시 시도해 주세요."
 
+    async def stream_ai_response(self, conversation_id: str, user_id: str, character_id: str, query_text: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        AI 응답을 토큰 단위로 스트리밍하는 메서드
+
+        :param conversation_id: 대화 ID
+        :param user_id: 사용자 ID
+        :param character_id: 캐릭터 ID
+        :param query_text: 방금 받은 사용자 메시지 내용
+        :return: 모델이 생성하는 응답 토큰들 (생성에 실패하면 예외를 그대로 전달하므로 호출한 쪽에서 처리)
+        """
+        try:
+            available_tokens, inputs = await self.prepare_ai_response(conversation_id, user_id, character_id, query_text)
+
+            # 열린 업스트림 스트림 수는 스트림이 끝날 때까지 LLM_MAX_OPEN_STREAMS로 제한
+            stream_slots = get_llm_stream_semaphore()
+            await asyncio.wait_for(stream_slots.acquire(), LLM_STREAM_ACQUIRE_TIMEOUT)
+            try:
+                stream = self.chains.reply_chain(available_tokens).astream(inputs)
+                try:
+                    # LLM 동시 호출 슬롯은 업스트림 요청을 열고 첫 토큰을 받을 때까지만 점유
+                    # (느린 SSE 클라이언트가 LLM_MAX_CONCURRENCY 슬롯을 붙잡지 않도록)
+                    async with get_llm_semaphore():
+                        try:
+                            first_token = await stream.__anext__()
+                        except StopAsyncIteration:
+                            first_token = None
+                    if first_token:
+                        yield first_token
+                    async for token in stream:
+                        if token:
+                            yield token
+                finally:
+                    await stream.aclose()
+            finally:
+                stream_slots.release()
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {str(e)}")
+            raise
+
+    async def stream_message_and_respond(self, conversation_id: str, message: MessageCreate, current_user: User) -> StreamingResponse:
+        """
+        사용자 메시지를 저장한 뒤 AI 응답을 SSE(text/event-stream)로 스트리밍하는 메서드
+
+        이벤트 순서: message(저장된 사용자 메시지) -> token(응답 토큰, 여러 번) -> done(전체 응답)
+        응답 생성에 실패하면 done 대신 error 이벤트를 보내고 응답을 저장하지 않습니다.
+        최종 응답의 저장, 벡터화, Pinecone 저장은 스트림이 닫힌 뒤 백그라운드 태스크로 실행되며,
+        끝까지 생성된 응답만 저장합니다 (실패하거나 중간에 끊긴 부분 응답은 저장하지 않음).
+
+        :param conversation_id: 대화 ID
+        :param message: 사용자 메시지
+        :param current_user: 현재 사용자
+        :return: SSE 스트리밍 응답
+        """
+        created_message = await self.create_message(conversation_id, message, current_user)
+        reply_chunks: List[str] = []
+        # 응답이 끝까지 생성된 경우에만 채워지며, 백그라운드 저장은 이 목록만 사용
+        completed_reply: List[str] = []
+
+        async def event_stream() -> AsyncIterator[str]:
+            yield self.format_sse("message", created_message.model_dump_json())
+            if message.sender_type == "user":
+                try:
+                    conversation = await self.get_conversation(conversation_id, current_user)
+                    async for token in self.stream_ai_response(conversation_id, str(current_user.id), str(conversation.character_id), message_text(message.content)):
+                        reply_chunks.append(token)
+                        yield self.format_sse("token", json.dumps({"token": token}, ensure_ascii=False))
+                except Exception:
+                    yield self.format_sse("error", json.dumps({"detail": "죄송합니다. 응답을 생성하는 데 문제가 발생했습니다. 다시 시도해 주세요."}, ensure_ascii=False))
+                    return
+            completed_reply.extend(reply_chunks)
+            yield self.format_sse("done", json.dumps({"content": "".join(reply_chunks)}, ensure_ascii=False))
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(self.save_streamed_response, conversation_id, completed_reply, current_user)
+        )
+
+    async def save_streamed_response(self, conversation_id: str, reply_chunks: List[str], current_user: User):
+        """
+        스트리밍이 끝난 AI 응답을 저장하는 메서드 (스트림 종료 후 실행)
+
+        :param conversation_id: 대화 ID
+        :param reply_chunks: 스트리밍된 응답 토큰들
+        :param current_user: 현재 사용자
+        """
+        if not reply_chunks:
+            return
+        ai_response = "".join(reply_chunks)
+        try:
+            # AI 응답은 create_message에서 컨텍스트에 추가됨
+            ai_message = MessageCreate(conversation_id=conversation_id, sender_type="character", content=[{"type": "text", "text": ai_response}])
+            await self.create_message(conversation_id, ai_message, current_user)
+        except Exception as e:
+            logger.error(f"Error saving streamed response: {str(e)}")
+
+    @staticmethod
+    def format_sse(event: str, data: str) -> str:
+        return f"event: {event}\ndata: {data}\n\n"
+
+    def format_message(self, message: MessageProfile) -> str:
+        return f"{message.sender_type}: {message_text(message.content)}"
 
     def format_messages(self, messages: List[MessageProfile]) -> str:
-        return "\n".join([f"{msg.sender}: {msg.content}" for msg in messages])
+        return "\n".join([self.format_message(msg) for msg in messages])
 
 
     async def update_affinity(self, conversation_id: str, user_id: str, character_id: str, message_content: str):
@@ -535,7 +819,8 @@ class ConversationService:
         )
     
     async def calculate_affinity_change(self, summary: str) -> float:
-        affinity_change_str = await self.affinity_chain.arun(summary=summary)
+        async with get_llm_semaphore():
+            affinity_change_str = await self.chains.affinity_chain.ainvoke({"summary": summary})
         try:
             affinity_change = float(affinity_change_str.strip())
             return max(-5, min(5, affinity_change))  # 값을 -5에서 5 사이로 제한
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    여러 요청에서 동시에 들어오는 임베딩 요청을 모아 한 번의 API 호출로 보내는 배처
+
+    첫 요청이 들어오고 max_wait_ms가 지나거나 max_batch_size개가 모이면 배치를 전송하고,
+    결과 벡터를 기다리던 각 호출자에게 돌려줍니다.
+
+    :param embed_many: 텍스트 목록을 받아 같은 순서의 벡터 목록을 반환하는 비동기 함수
+    :param max_batch_size: 한 번에 보낼 최대 텍스트 수
+    :param max_wait_ms: 배치를 모으는 최대 대기 시간 (밀리초)
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], Awaitable[List[List[float]]]], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.embed_many = embed_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """텍스트 하나를 다음 배치에 넣고 벡터가 나올 때까지 기다리는 메서드"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        # 같은 배치 안의 중복 텍스트는 한 번만 보냄
+        unique_texts: Dict[str, int] = {}
+        for text, _ in batch:
+            unique_texts.setdefault(text, len(unique_texts))
+
+        try:
+            vectors = await self.embed_many(list(unique_texts))
+            if len(vectors) != len(unique_texts):
+                raise ValueError(f"Expected {len(unique_texts)} embeddings, got {len(vectors)}")
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(vectors[unique_texts[text]])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # 어떤 실패든 배치의 나머지 호출자가 영원히 기다리지 않도록 모두 실패 처리
+            logger.error(f"Embedding batch of {len(batch)} failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
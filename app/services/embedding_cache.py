@@ -0,0 +1,89 @@
+import base64
+import hashlib
+import logging
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+
+from app.config import get_redis_client
+from app.utils.cache import LRUCache
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    임베딩 결과를 (모델 이름 + 정규화된 텍스트)의 해시로 저장하는 캐시
+
+    프로세스 내 LRU를 먼저 확인하고, 없으면 Redis를 확인합니다.
+    Redis에는 float32 바이트를 base64로 인코딩해 TTL과 함께 저장합니다.
+    """
+
+    KEY_PREFIX = "embedding"
+
+    def __init__(self, maxsize: int = 4096, redis_ttl: int = 60 * 60 * 24 * 7):
+        self.local = LRUCache(maxsize=maxsize)
+        self.redis_ttl = redis_ttl  # Redis 항목 유효 시간 (초)
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """유니코드 정규화(NFC) 후 연속 공백을 하나로 줄인 텍스트"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}\x00{self.normalize(text)}".encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{model}:{digest}"
+
+    @staticmethod
+    def encode(vector: List[float]) -> str:
+        return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+    @staticmethod
+    def decode(payload: str) -> List[float]:
+        vector = array("f")
+        vector.frombytes(base64.b64decode(payload))
+        return vector.tolist()
+
+    async def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        vector = self.local.get(key)
+        if vector is not None:
+            return vector
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                payload = await redis_client.get(key)
+                if payload:
+                    vector = self.decode(payload)
+                    self.local.set(key, vector)
+                    self.redis_hits += 1
+                    return vector
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {str(e)}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, model: str, text: str, vector: List[float]):
+        key = self.make_key(model, text)
+        self.local.set(key, vector)
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                await redis_client.setex(key, self.redis_ttl, self.encode(vector))
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """이 워커 프로세스의 캐시 적중/실패 횟수 (Redis에 모으지 않으므로 워커마다 다름)"""
+        return {
+            "local_hits": self.local.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "local_size": len(self.local)
+        }
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_redis_client
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class SummaryJobQueue:
+    """
+    대화 요약(요약 생성 + 호감도 계산) 작업을 처리하는 Redis 기반 작업 큐
+
+    - 대기열: summary_jobs (LPUSH / BRPOPLPUSH)
+    - 처리 중: summary_jobs:processing:{워커 id} (워커가 죽어도 작업을 잃지 않도록 워커별로 보관)
+    - 워커 목록/임대: summary_jobs:workers (SET) + summary_jobs:worker:{워커 id} (TTL이 있는 heartbeat 키)
+    - 중복 방지: summary_jobs:pending (대화당 대기 중인 작업은 하나만 유지)
+    - 재시도: summary_jobs:delayed (실행 시각을 점수로 갖는 ZSET, 지수 백오프)
+    - 실패: summary_jobs:dead (최대 재시도 횟수를 넘긴 작업)
+
+    여러 키를 함께 바꾸는 단계(추가, 재시도 등록, 재시도 승격)는 Lua 스크립트로 원자적으로 처리해
+    중간에 프로세스가 죽어도 pending에만 남고 큐에는 없는 작업이 생기지 않도록 합니다.
+    heartbeat가 만료된(죽은) 워커의 처리 중 작업만 대기열로 되돌리므로, 살아 있는 다른 워커의 작업은 건드리지 않습니다.
+    """
+
+    QUEUE_KEY = "summary_jobs"
+    PROCESSING_KEY_PREFIX = "summary_jobs:processing"
+    WORKERS_KEY = "summary_jobs:workers"
+    HEARTBEAT_KEY_PREFIX = "summary_jobs:worker"
+    PENDING_KEY = "summary_jobs:pending"
+    DELAYED_KEY = "summary_jobs:delayed"
+    DEAD_KEY = "summary_jobs:dead"
+
+    # 같은 대화의 작업이 대기 중이 아닐 때만 pending 등록과 LPUSH를 함께 수행
+    ENQUEUE_SCRIPT = """
+    if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+        return 0
+    end
+    redis.call('LPUSH', KEYS[2], ARGV[2])
+    return 1
+    """
+
+    # 실패한 작업을 처리 중 목록에서 빼면서, 같은 대화의 새 작업이 없으면 지연 재시도로 등록
+    RETRY_SCRIPT = """
+    redis.call('LREM', KEYS[1], 1, ARGV[1])
+    if redis.call('SADD', KEYS[2], ARGV[2]) == 0 then
+        return 0
+    end
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[3])
+    return 1
+    """
+
+    # 재시도 시각이 된 작업을 ZREM과 LPUSH를 함께 해서 대기열로 옮김
+    PROMOTE_SCRIPT = """
+    local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+    for _, job in ipairs(jobs) do
+        redis.call('ZREM', KEYS[1], job)
+        redis.call('LPUSH', KEYS[2], job)
+    end
+    return #jobs
+    """
+
+    def __init__(self, redis=None, max_attempts: int = 5, retry_backoff: float = 5.0, poll_timeout: int = 2, lease_ttl: int = 30):
+        self._redis = redis
+        self.max_attempts = max_attempts  # 최대 시도 횟수
+        self.retry_backoff = retry_backoff  # 첫 재시도 대기 시간 (초), 이후 2배씩 증가
+        self.poll_timeout = poll_timeout  # BRPOPLPUSH 대기 시간 (초), REDIS_SOCKET_TIMEOUT보다 짧아야 함
+        self.lease_ttl = lease_ttl  # heartbeat가 이 시간(초) 동안 갱신되지 않으면 워커가 죽은 것으로 봄
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.processing_key = self._processing_key(self.worker_id)
+
+    @property
+    def redis_client(self):
+        return self._redis if self._redis is not None else get_redis_client()
+
+    def _processing_key(self, worker_id: str) -> str:
+        return f"{self.PROCESSING_KEY_PREFIX}:{worker_id}"
+
+    def _heartbeat_key(self, worker_id: str) -> str:
+        return f"{self.HEARTBEAT_KEY_PREFIX}:{worker_id}"
+
+    async def enqueue(self, conversation_id: str, user_id: str, email: str = "") -> bool:
+        """
+        대화 요약 작업을 큐에 추가하는 메서드
+
+        :param conversation_id: 요약할 대화 ID
+        :param user_id: 대화 소유자 ID
+        :param email: 대화 소유자 이메일
+        :return: 새로 추가되었으면 True, 같은 대화의 작업이 이미 대기 중이면 False
+        """
+        job = {
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "email": email,
+            "attempts": 0,
+            "enqueued_at": time.time()
+        }
+        if not await self.redis_client.eval(self.ENQUEUE_SCRIPT, 2, self.PENDING_KEY, self.QUEUE_KEY, conversation_id, json.dumps(job)):
+            logger.debug(f"Summary job for conversation {conversation_id} already pending")
+            return False
+        return True
+
+    async def promote_due_jobs(self) -> int:
+        """재시도 시각이 된 작업을 대기열로 옮기는 메서드"""
+        return int(await self.redis_client.eval(self.PROMOTE_SCRIPT, 2, self.DELAYED_KEY, self.QUEUE_KEY, time.time()))
+
+    async def heartbeat(self):
+        """이 워커가 살아 있음을 알리는 임대(lease)를 갱신하는 메서드"""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.sadd(self.WORKERS_KEY, self.worker_id)
+            pipe.set(self._heartbeat_key(self.worker_id), time.time(), ex=self.lease_ttl)
+            await pipe.execute()
+
+    async def requeue_stale_jobs(self) -> int:
+        """
+        heartbeat가 만료된 워커가 처리하다 남긴 작업을 대기열로 되돌리는 메서드
+
+        살아 있는 워커의 처리 중 목록은 건드리지 않습니다. 작업은 RPOPLPUSH로 하나씩 옮기므로
+        여러 워커가 동시에 같은 죽은 워커를 정리해도 작업이 중복되지 않습니다.
+        """
+        requeued = 0
+        for worker_id in await self.redis_client.smembers(self.WORKERS_KEY):
+            if worker_id == self.worker_id or await self.redis_client.exists(self._heartbeat_key(worker_id)):
+                continue
+            processing_key = self._processing_key(worker_id)
+            while await self.redis_client.rpoplpush(processing_key, self.QUEUE_KEY):
+                requeued += 1
+            await self.redis_client.srem(self.WORKERS_KEY, worker_id)
+            logger.info(f"Requeued jobs of expired summary worker {worker_id}")
+        return requeued
+
+    async def dequeue(self) -> Optional[str]:
+        """대기열에서 작업 하나를 꺼내 이 워커의 처리 중 목록으로 옮기는 메서드 (없으면 None)"""
+        return await self.redis_client.brpoplpush(self.QUEUE_KEY, self.processing_key, timeout=self.poll_timeout)
+
+    async def acknowledge(self, raw_job: str):
+        """처리가 끝난 작업을 처리 중 목록에서 제거하는 메서드"""
+        await self.redis_client.lrem(self.processing_key, 1, raw_job)
+
+    async def retry_or_bury(self, raw_job: str, job: Dict[str, Any], error: Exception):
+        """
+        실패한 작업을 지연 재시도하거나, 최대 시도 횟수를 넘기면 실패 목록으로 옮기는 메서드
+
+        :param raw_job: 큐에서 꺼낸 원본 작업 문자열
+        :param job: 파싱된 작업
+        :param error: 발생한 예외
+        """
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["last_error"] = str(error)
+        conversation_id = job.get("conversation_id")
+
+        if job["attempts"] >= self.max_attempts:
+            logger.error(f"Summary job for conversation {conversation_id} failed permanently: {str(error)}")
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.lpush(self.DEAD_KEY, json.dumps(job))
+                pipe.lrem(self.processing_key, 1, raw_job)
+                await pipe.execute()
+            return
+
+        delay = self.retry_backoff * (2 ** (job["attempts"] - 1))
+        scheduled = await self.redis_client.eval(
+            self.RETRY_SCRIPT, 3, self.processing_key, self.PENDING_KEY, self.DELAYED_KEY,
+            raw_job, conversation_id, json.dumps(job), time.time() + delay
+        )
+        if scheduled:
+            logger.warning(f"Summary job for conversation {conversation_id} failed (attempt {job['attempts']}), retrying in {delay}s: {str(error)}")
+        else:
+            # 처리 중에 같은 대화의 새 작업이 들어왔으므로 그 작업이 재시도를 대신함
+            logger.warning(f"Summary job for conversation {conversation_id} failed, newer job already pending: {str(error)}")
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Summary worker heartbeat failed: {str(e)}")
+
+    async def run_worker(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """
+        큐의 작업을 계속 꺼내 처리하는 워커 루프
+
+        :param handler: 작업(dict)을 받아 처리하는 비동기 함수
+        """
+        await self.heartbeat()
+        # 긴 작업을 처리하는 동안에도 임대가 만료되지 않도록 백그라운드에서 갱신
+        keep_alive = asyncio.create_task(self._keep_alive())
+        logger.info(f"Summary job worker {self.worker_id} started")
+        try:
+            while True:
+                await self.requeue_stale_jobs()
+                await self.promote_due_jobs()
+                raw_job = await self.dequeue()
+                if raw_job is None:
+                    continue
+                await self.process(raw_job, handler)
+        finally:
+            keep_alive.cancel()
+            await asyncio.gather(keep_alive, return_exceptions=True)
+            await self.redis_client.srem(self.WORKERS_KEY, self.worker_id)
+
+    async def process(self, raw_job: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """꺼낸 작업 하나를 처리하고 결과에 따라 확인/재시도하는 메서드"""
+        try:
+            job = json.loads(raw_job)
+        except ValueError:
+            logger.error(f"Dropping malformed summary job: {raw_job}")
+            await self.acknowledge(raw_job)
+            return
+
+        # 처리 시작 후 들어오는 메시지는 새 작업으로 다시 큐에 들어갈 수 있도록 해제
+        await self.redis_client.srem(self.PENDING_KEY, job["conversation_id"])
+        try:
+            await handler(job)
+            await self.acknowledge(raw_job)
+        except Exception as e:
+            await self.retry_or_bury(raw_job, job, e)
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.models.character import (CharacterProfile, LanguageProficiency,
+                                  LocalizedContent)
+from app.services.prompt_packer import get_encoding
+from app.utils.cache import LRUCache
+
+SUPPORTED_LOCALES = ("ko", "en", "ja")
+DEFAULT_LOCALE = "ko"
+
+
+@dataclass(frozen=True)
+class CompiledPersona:
+    """프롬프트에 바로 넣을 수 있는 캐릭터 설정 텍스트와 토큰 수"""
+    character_id: str
+    version: str
+    locale: str
+    text: str
+    tokens: int
+
+
+class PersonaCompiler:
+    """
+    캐릭터 프로필을 언어별 짧은 페르소나 프롬프트 조각으로 변환해 캐시하는 클래스
+
+    캐시 키는 (캐릭터 ID, 버전, 언어)이므로 update_character로 버전이 바뀌면 새로 만들어집니다.
+    같은 버전으로 수정된 경우에 대비해 invalidate()로 해당 캐릭터의 항목을 모두 지울 수 있습니다.
+
+    :param model: 토큰 수를 셀 모델 이름
+    :param max_tokens: 페르소나 조각의 최대 토큰 수 (넘으면 뒤쪽의 배경 이야기부터 잘림)
+    :param maxsize: 캐시할 최대 조각 수
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", max_tokens: int = 600, maxsize: int = 2048):
+        self.encoding = get_encoding(model)
+        self.max_tokens = max_tokens
+        self._cache = LRUCache(maxsize=maxsize)
+        self._keys_by_character: Dict[str, Set[Tuple[str, str, str]]] = {}
+
+    @staticmethod
+    def resolve_locale(languages: List[LanguageProficiency], locale: Optional[str] = None) -> str:
+        """요청된 언어가 없으면 캐릭터가 가장 선호하는 지원 언어를 사용"""
+        if locale in SUPPORTED_LOCALES:
+            return locale
+        for language in sorted(languages, key=lambda l: l.preference_order):
+            if language.language_code in SUPPORTED_LOCALES:
+                return language.language_code
+        return DEFAULT_LOCALE
+
+    @staticmethod
+    def localize(content: Optional[LocalizedContent], locale: str) -> str:
+        """해당 언어의 내용을 반환하고, 없으면 다른 언어로 대체"""
+        if content is None:
+            return ""
+        for code in (locale, *SUPPORTED_LOCALES):
+            value = getattr(content, code)
+            if value:
+                return value.strip()
+        return ""
+
+    def render(self, character: CharacterProfile, locale: str) -> str:
+        """캐릭터를 한 줄에 한 항목씩 요약한 텍스트로 만드는 메서드 (빈 항목은 생략)"""
+        def text(content: Optional[LocalizedContent]) -> str:
+            return self.localize(content, locale)
+
+        lines: List[Tuple[str, str]] = [
+            ("이름", text(character.names)),
+            ("성별/나이", f"{character.gender}, {character.age}"),
+            ("직업", text(character.occupation)),
+            ("성격", ", ".join(f"{t.trait}({t.score:.1f})" for t in sorted(character.personality_traits, key=lambda t: -t.score))),
+            ("관심사", ", ".join(f"{i.topic}({i.level})" for i in character.interests)),
+            ("배경", text(character.background)),
+            ("외모", text(character.appearance_description)),
+            ("연애 상태", character.relationship_status or ""),
+            ("말투", text(character.conversation_style)),
+            ("소통 방식", ", ".join(f"{key}: {value}" for key, value in character.communication_preferences.items())),
+            ("목표", text(character.goals)),
+            ("버릇", text(character.quirks)),
+            ("관계 진행 속도", character.relationship_progression_pace),
+            ("갈등 해결 방식", character.conflict_resolution_style),
+            ("지시", character.character_prompt.strip()),
+            # 가장 길어질 수 있으므로 마지막에 두어 예산을 넘으면 먼저 잘리도록 함
+            ("배경 이야기", text(character.backstory)),
+        ]
+        return "\n".join(f"{label}: {value}" for label, value in lines if value)
+
+    def compile(self, character: CharacterProfile, locale: Optional[str] = None) -> CompiledPersona:
+        """캐시된 조각을 반환하고, 없으면 렌더링해 토큰 수와 함께 캐시하는 메서드"""
+        locale = self.resolve_locale(character.languages, locale)
+        cached = self.get(str(character.id), character.version, locale)
+        if cached is not None:
+            return cached
+
+        tokens = self.encoding.encode(self.render(character, locale))
+        if len(tokens) > self.max_tokens:
+            tokens = tokens[:self.max_tokens]
+        persona = CompiledPersona(str(character.id), character.version, locale, self.encoding.decode(tokens), len(tokens))
+
+        key = (persona.character_id, persona.version, locale)
+        self._cache.set(key, persona)
+        self._keys_by_character.setdefault(persona.character_id, set()).add(key)
+        return persona
+
+    def get(self, character_id: str, version: str, locale: str) -> Optional[CompiledPersona]:
+        return self._cache.get((str(character_id), version, locale))
+
+    def invalidate(self, character_id: str):
+        """캐릭터의 모든 버전/언어 조각을 캐시에서 제거하는 메서드"""
+        for key in self._keys_by_character.pop(str(character_id), set()):
+            self._cache.delete(key)
+
+
+persona_compiler = PersonaCompiler()
@@ -0,0 +1,116 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import tiktoken
+
+from app.utils.cache import LRUCache
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-3.5-turbo") -> tiktoken.Encoding:
+    """모델별 tiktoken 인코더 (프로세스당 한 번만 생성)"""
+    return tiktoken.encoding_for_model(model)
+
+
+@dataclass
+class PromptSection:
+    """
+    프롬프트에 들어갈 섹션 하나
+
+    :param name: 프롬프트 입력 변수 이름
+    :param items: 섹션을 이루는 항목들 (메시지 한 줄, 요약 전문 등)
+    :param budget: 섹션에 허용된 최대 토큰 수
+    :param priority: 전체 예산을 넘으면 낮은 우선순위부터 줄임
+    :param keep_last: True이면 뒤쪽(최신) 항목을 우선 유지, False이면 앞쪽 항목을 우선 유지
+    """
+    name: str
+    items: List[str]
+    budget: int
+    priority: int
+    keep_last: bool = False
+    packed: List[str] = field(default_factory=list)
+    tokens: int = 0
+
+
+class PromptPacker:
+    """
+    섹션별 토큰 예산에 맞춰 프롬프트 입력값을 채우는 클래스
+
+    1. 각 섹션을 자신의 예산 안에서 채우고 (넘치는 항목은 버리거나, 한 항목이 예산보다 크면 잘라냄)
+    2. 그래도 전체 프롬프트 예산을 넘으면 우선순위가 낮은 섹션의 항목부터 버립니다.
+    토큰 수는 텍스트별로 캐시하므로 같은 메시지를 다시 셀 때는 인코딩하지 않습니다.
+
+    :param model: 토큰 수를 셀 모델 이름
+    :param context_window: 모델의 최대 컨텍스트 토큰 수
+    :param response_tokens: 응답용으로 남겨둘 최소 토큰 수
+    :param overhead_tokens: 채팅 메시지 포맷 등을 위한 여유 토큰 수
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", context_window: int = 4096, response_tokens: int = 1024, overhead_tokens: int = 100, cache_size: int = 10000):
+        self.encoding = get_encoding(model)
+        self.context_window = context_window
+        self.response_tokens = response_tokens
+        self.overhead_tokens = overhead_tokens
+        self._token_counts = LRUCache(maxsize=cache_size)
+
+    def count_tokens(self, text: str) -> int:
+        count = self._token_counts.get(text)
+        if count is None:
+            count = len(self.encoding.encode(text))
+            self._token_counts.set(text, count)
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """텍스트를 max_tokens 이하로 자르는 메서드"""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def _fill(self, section: PromptSection):
+        ordered = list(reversed(section.items)) if section.keep_last else list(section.items)
+        packed, used = [], 0
+        for item in ordered:
+            # 줄바꿈 구분자 1토큰 포함
+            cost = self.count_tokens(item) + 1
+            if used + cost > section.budget:
+                if not packed:
+                    item = self.truncate(item, section.budget - 1)
+                    if item:
+                        packed.append(item)
+                        used += self.count_tokens(item) + 1
+                break
+            packed.append(item)
+            used += cost
+        section.packed = list(reversed(packed)) if section.keep_last else packed
+        section.tokens = used
+
+    def pack(self, fixed_texts: List[str], sections: List[PromptSection], reserved_tokens: int = 0) -> Tuple[Dict[str, str], int]:
+        """
+        섹션들을 예산에 맞춰 채우는 메서드
+
+        :param fixed_texts: 항상 포함되는 텍스트들 (템플릿 본문, 짧은 고정 입력값 등)
+        :param sections: 예산을 적용할 섹션들
+        :param reserved_tokens: 토큰 수를 이미 알고 있는 고정 입력값의 토큰 수 (미리 컴파일된 페르소나 등)
+        :return: (섹션 이름 -> 채워진 텍스트, 응답에 사용할 수 있는 최대 토큰 수)
+        """
+        fixed_tokens = reserved_tokens + sum(self.count_tokens(text) for text in fixed_texts)
+        prompt_budget = self.context_window - self.response_tokens - self.overhead_tokens
+
+        for section in sections:
+            self._fill(section)
+
+        total = fixed_tokens + sum(section.tokens for section in sections)
+        for section in sorted(sections, key=lambda s: s.priority):
+            while total > prompt_budget and section.packed:
+                # 유지 우선순위가 가장 낮은 항목부터 제거
+                dropped = section.packed.pop(0) if section.keep_last else section.packed.pop()
+                cost = self.count_tokens(dropped) + 1
+                section.tokens -= cost
+                total -= cost
+
+        packed = {section.name: "\n".join(section.packed) for section in sections}
+        return packed, self.context_window - total - self.overhead_tokens
@@ -0,0 +1,145 @@
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from app.config import get_redis_client
+from app.models.conversation import MessageProfile
+from app.utils.codec import ModelCodec
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class RecentMessageStore:
+    """
+    대화별 최근 메시지를 Redis 리스트에 보관하는 링 버퍼 (최신 메시지가 맨 앞)
+
+    - push: LPUSHX + LTRIM + EXPIRE와 세대 번호 INCR을 MULTI로 한 번에 보냄 (버퍼가 없으면 세대만 올림)
+    - refill: DB에서 읽은 최근 capacity개를 Lua 스크립트로 한 번에 채움
+      DB를 읽기 전에 세대 번호를 기억해 두고, 그 사이 push가 있었으면(세대가 바뀌었으면) 채우지 않습니다.
+      버퍼가 비어 있는 동안 저장된 메시지는 LPUSHX로 들어가지 않고 오래된 DB 스냅샷에도 없을 수 있기 때문입니다.
+    - 대화 전체가 capacity보다 짧으면 맨 끝에 END_MARKER를 두어 "이 뒤로는 메시지가 없음"을 표시하므로,
+      capacity 이하의 어떤 N에 대해서도 캐시만으로 최근 N개를 정확히 돌려줄 수 있습니다.
+      메시지가 쌓여 LTRIM이 표시를 밀어내면 버퍼가 가득 찬 상태가 됩니다.
+
+    :param capacity: 대화당 보관할 최대 메시지 수
+    :param ttl: 버퍼 유효 시간 (초)
+    """
+
+    KEY_PREFIX = "recent_messages"
+    END_MARKER = "__end__"
+
+    # DB 스냅샷을 읽은 뒤 push가 있었으면(KEYS[2] 세대가 ARGV[3]과 다르면) 채우지 않음
+    # 다른 요청이 먼저 채웠으면 덮어쓰지 않음 (그 사이 push된 메시지를 잃지 않도록)
+    # ARGV[2]가 '1'이면 형식이 맞지 않는 기존 버퍼를 지우고 다시 채움
+    REFILL_SCRIPT = """
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then
+        return 0
+    end
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        if ARGV[2] ~= '1' then
+            return 0
+        end
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 4))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    return 1
+    """
+
+    def __init__(self, capacity: int = 50, ttl: int = 60 * 60 * 24):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.codec = ModelCodec(MessageProfile)
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{conversation_id}"
+
+    def _generation_key(self, conversation_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{conversation_id}:gen"
+
+    def encode(self, message: MessageProfile) -> str:
+        return self.codec.encode(message)
+
+    def decode(self, payload: str) -> MessageProfile:
+        return self.codec.decode(payload)
+
+    async def push(self, conversation_id: str, message: MessageProfile):
+        """새 메시지를 버퍼 맨 앞에 넣고 capacity개로 자르는 메서드 (한 번의 왕복)"""
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        key, generation_key = self._key(conversation_id), self._generation_key(conversation_id)
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.lpushx(key, self.encode(message))
+                pipe.ltrim(key, 0, self.capacity - 1)
+                pipe.expire(key, self.ttl)
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Recent message push failed for {conversation_id}: {str(e)}")
+
+    async def get(self, conversation_id: str, limit: int, loader: Callable[[int], Awaitable[List[MessageProfile]]]) -> List[MessageProfile]:
+        """
+        최근 limit개의 메시지를 오래된 순으로 반환하는 메서드
+
+        :param limit: 가져올 메시지 수 (capacity보다 크면 DB에서 직접 조회)
+        :param loader: 최근 n개의 메시지를 오래된 순으로 반환하는 DB 조회 함수
+        """
+        if limit > self.capacity:
+            return await loader(limit)
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return await loader(limit)
+
+        key = self._key(conversation_id)
+        cached: Optional[List[str]] = None
+        generation: Optional[str] = None
+        try:
+            # 끝 표시까지 확인하기 위해 하나 더 읽고, miss일 때 쓸 세대 번호를 함께 읽음
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, 0, limit)
+                pipe.get(self._generation_key(conversation_id))
+                cached, generation = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Recent message read failed for {conversation_id}: {str(e)}")
+
+        if cached:
+            try:
+                if self.END_MARKER in cached:
+                    cached = cached[:cached.index(self.END_MARKER)]
+                    return [self.decode(payload) for payload in reversed(cached)]
+                if len(cached) >= limit:
+                    return [self.decode(payload) for payload in reversed(cached[:limit])]
+            except ValueError as e:
+                logger.warning(f"Discarding malformed recent message buffer for {conversation_id}: {str(e)}")
+
+        # 없거나 (이전 형식이라) 쓸 수 없으면 DB에서 capacity개를 읽어 한 번에 채움
+        messages = await loader(self.capacity)
+        await self.refill(conversation_id, messages, generation or "0", replace=bool(cached))
+        return messages[-limit:] if limit > 0 else []
+
+    async def refill(self, conversation_id: str, messages: List[MessageProfile], generation: str, replace: bool = False):
+        """
+        DB에서 읽은 최근 메시지(오래된 순)로 버퍼를 채우는 메서드
+
+        :param generation: DB를 읽기 전에 확인한 세대 번호 (그 뒤 push가 있었으면 채우지 않음)
+        :param replace: True이면 기존 버퍼를 지우고 채움 (False이면 버퍼가 없을 때만 채움)
+        """
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        payloads = [self.encode(message) for message in reversed(messages[-self.capacity:])]
+        if len(messages) < self.capacity:
+            payloads.append(self.END_MARKER)
+        try:
+            await redis_client.eval(self.REFILL_SCRIPT, 2, self._key(conversation_id), self._generation_key(conversation_id), self.ttl, "1" if replace else "0", generation, *payloads)
+        except Exception as e:
+            logger.warning(f"Recent message refill failed for {conversation_id}: {str(e)}")
+
+    async def clear(self, conversation_id: str):
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            await redis_client.delete(self._key(conversation_id), self._generation_key(conversation_id))
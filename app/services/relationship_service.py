@@ -1,85 +1,221 @@
-import json
-import os
+import asyncio
+import logging
 from datetime import datetime, timezone
+from typing import Dict, List
 
 from fastapi import HTTPException
-from supabase import Client, create_client
 
-from app.config import redis_client
+from app.config import (NEAR_CACHE_MAXSIZE, NEAR_CACHE_TTL,
+                        RELATIONSHIP_FLUSH_INTERVAL, get_redis_client)
+from app.database import get_supabase_client
 from app.models.relationship import (RelationshipType,
                                      UserCharacterInteractionCreate,
                                      UserCharacterInteractionInDB,
                                      UserCharacterInteractionUpdate)
+from app.utils.cache import LRUCache
+from app.utils.codec import ModelCodec
+from app.utils.invalidation import invalidation_bus
+from app.utils.read_through import ReadThroughCache
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 
-supabase: Client = create_client(supabase_url, supabase_key)
+class RelationshipService:
+    # 호감도/상호작용 횟수 카운터 (Redis 해시, 주기적으로 DB에 반영)
+    COUNTER_KEY_PREFIX = "interaction_counters"
+    # DB에 아직 반영되지 않은 카운터 목록 ("character_id:user_id")
+    DIRTY_KEY = "interaction_counters:dirty"
+    # 카운터 유효 시간 (초), 만료되면 DB 값으로 다시 초기화
+    COUNTER_TTL = 60 * 60 * 24
+    # 한 번에 DB에 반영할 최대 카운터 수
+    FLUSH_BATCH_SIZE = 500
 
+    # 카운터가 없으면 초기값(ARGV[6..8])이 있을 때만 초기화하고, 없으면 nil을 반환해 DB에서 읽어오도록 함
+    # 호감도는 [-100, 100]으로 제한하고, 변경된 카운터를 dirty 집합에 추가
+    APPLY_DELTA_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        if #ARGV < 8 then
+            return nil
+        end
+        redis.call('HSETNX', KEYS[1], 'id', ARGV[6])
+        redis.call('HSETNX', KEYS[1], 'affinity', ARGV[7])
+        redis.call('HSETNX', KEYS[1], 'interaction_count', ARGV[8])
+    end
+    local affinity = tonumber(redis.call('HGET', KEYS[1], 'affinity')) + tonumber(ARGV[1])
+    affinity = math.max(-100, math.min(100, affinity))
+    redis.call('HSET', KEYS[1], 'affinity', tostring(affinity), 'last_interaction', ARGV[3])
+    local count = redis.call('HINCRBY', KEYS[1], 'interaction_count', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    redis.call('SADD', KEYS[2], ARGV[5])
+    return {tostring(affinity), count}
+    """
 
-class RelationshipService:
     def __init__(self):
-        self.redis_client = redis_client
+        # 상호작용 정보 읽기 캐시 (1시간, 없음은 1분)
+        interaction_codec = ModelCodec(UserCharacterInteractionInDB)
+        self.interaction_cache = ReadThroughCache("interaction", encode=interaction_codec.encode, decode=interaction_codec.decode)
+        # 카운터도 워커 안에서 잠시 캐시 (변경 시 invalidation_bus로 무효화)
+        self.counters_near = LRUCache(maxsize=NEAR_CACHE_MAXSIZE, ttl=NEAR_CACHE_TTL)
+        invalidation_bus.register(self.COUNTER_KEY_PREFIX, self.counters_near)
+
+    @property
+    def redis_client(self):
+        # lifespan에서 생성된 asyncio Redis 클라이언트
+        return get_redis_client()
+
+    def _counter_key(self, character_id: str, user_id: str) -> str:
+        return f"{self.COUNTER_KEY_PREFIX}:{character_id}:{user_id}"
+
+    def _apply_counters(self, interaction: UserCharacterInteractionInDB, counters: Dict[str, str]) -> UserCharacterInteractionInDB:
+        """DB에 아직 반영되지 않은 Redis 카운터 값을 상호작용 정보에 덮어쓰는 메서드"""
+        if not counters or counters.get("affinity") is None:
+            return interaction
+        affinity = float(counters["affinity"])
+        update = {
+            "affinity": affinity,
+            "relationship_type": self.get_relationship_type(affinity),
+            "interaction_count": int(counters["interaction_count"]),
+        }
+        if counters.get("last_interaction"):
+            update["last_interaction"] = datetime.fromisoformat(counters["last_interaction"])
+        return interaction.model_copy(update=update)
+
+    async def get_counters(self, character_id: str, user_id: str) -> Dict[str, str]:
+        """DB에 아직 반영되지 않은 카운터 (없으면 빈 딕셔너리)"""
+        member = f"{character_id}:{user_id}"
+        counters = self.counters_near.get(member)
+        if counters is None:
+            counters = await self.redis_client.hgetall(self._counter_key(character_id, user_id))
+            self.counters_near.set(member, counters)
+        return counters
+
+    async def invalidate_counters(self, character_id: str, user_id: str):
+        await invalidation_bus.publish(self.COUNTER_KEY_PREFIX, f"{character_id}:{user_id}")
 
     async def get_interaction(self, character_id: str, user_id: str) -> UserCharacterInteractionInDB:
-        # Redis에서 먼저 확인
-        cached_interaction = self.redis_client.get(f"interaction:{character_id}:{user_id}")
-        if cached_interaction:
-            return UserCharacterInteractionInDB(**json.loads(cached_interaction))
-        
-        # Redis에 없으면 데이터베이스에서 조회
-        response = supabase.table("user_character_interactions").select("*").eq("character_id", character_id).eq("user_id", user_id).execute()
+        # 워커 내 캐시 -> Redis 순으로 확인 (없으면 데이터베이스에서 조회해 캐시), 카운터는 동시에 조회
+        interaction, counters = await asyncio.gather(
+            self.interaction_cache.get(f"{character_id}:{user_id}", lambda: self.get_interaction_from_db(character_id, user_id)),
+            self.get_counters(character_id, user_id)
+        )
+        return self._apply_counters(interaction, counters)
+
+    async def get_interaction_from_db(self, character_id: str, user_id: str) -> UserCharacterInteractionInDB:
+        response = await get_supabase_client().table("user_character_interactions").select("*").eq("character_id", character_id).eq("user_id", user_id).execute()
         if response.data:
-            interaction = UserCharacterInteractionInDB(**response.data[0])
-            # Redis에 캐시 저장
-            self.redis_client.setex(f"interaction:{character_id}:{user_id}", 3600, json.dumps(interaction.model_dump()))  # 1시간 동안 캐시
-            return interaction
+            return UserCharacterInteractionInDB(**response.data[0])
         raise HTTPException(status_code=404, detail="Interaction not found")
 
 
     async def create_interaction(self, interaction: UserCharacterInteractionCreate) -> UserCharacterInteractionInDB:
-        response = supabase.table("user_character_interactions").insert(interaction.model_dump()).execute()
+        response = await get_supabase_client().table("user_character_interactions").insert(interaction.model_dump()).execute()
         if response.data:
             created_interaction = UserCharacterInteractionInDB(**response.data[0])
-            # Redis에 캐시 저장
-            self.redis_client.setex(
-                f"interaction:{created_interaction.character_id}:{created_interaction.user_id}",
-                3600,
-                json.dumps(created_interaction.model_dump())
-            )
+            # Redis에 캐시 저장 (없음으로 캐시된 결과를 덮어씀)
+            await self.interaction_cache.set(f"{created_interaction.character_id}:{created_interaction.user_id}", created_interaction)
             return created_interaction
         raise HTTPException(status_code=400, detail="Failed to create interaction")
 
     async def update_interaction(self, character_id: str, user_id: str, interaction: UserCharacterInteractionUpdate) -> UserCharacterInteractionInDB:
-        update_data = interaction.model_dump(exclude_unset=True)
-        update_data['last_interaction'] = datetime.now(timezone.utc)
-        response = supabase.table("user_character_interactions").update(update_data).eq("character_id", character_id).eq("user_id", user_id).execute()
+        update_data = interaction.model_dump(mode="json", exclude_unset=True)
+        update_data['last_interaction'] = datetime.now(timezone.utc).isoformat()
+        resets_counters = any(field in update_data for field in ("affinity", "relationship_type", "interaction_count"))
+        if resets_counters and await self.redis_client.srem(self.DIRTY_KEY, f"{character_id}:{user_id}"):
+            # 아직 반영되지 않은 카운터를 먼저 DB에 반영한 뒤 직접 지정한 값으로 덮어씀
+            await self._flush_members([f"{character_id}:{user_id}"])
+        response = await get_supabase_client().table("user_character_interactions").update(update_data).eq("character_id", character_id).eq("user_id", user_id).execute()
         if response.data:
             updated_interaction = UserCharacterInteractionInDB(**response.data[0])
+            if resets_counters:
+                # 이후 조회에서 이전 카운터 값이 직접 지정한 값을 덮어쓰지 않도록 카운터를 버림
+                await self.redis_client.delete(self._counter_key(character_id, user_id))
+                await self.invalidate_counters(character_id, user_id)
             # Redis 캐시 업데이트
-            self.redis_client.setex(f"interaction:{character_id}:{user_id}", 3600, json.dumps(updated_interaction.model_dump()))
+            await self.interaction_cache.set(f"{character_id}:{user_id}", updated_interaction)
             return updated_interaction
         raise HTTPException(status_code=400, detail="Failed to update interaction")
 
 
     async def update_affinity(self, character_id: str, user_id: str, affinity_change: float):
-        interaction = await self.get_interaction(character_id, user_id)
-        new_affinity = max(-100, min(100, interaction.affinity + affinity_change))
-        new_relationship_type = self.get_relationship_type(new_affinity)
-        updated_interaction = await self.update_interaction(
-            character_id,
-            user_id,
-            UserCharacterInteractionUpdate(
-                affinity=new_affinity, 
-                relationship_type=new_relationship_type,
-                interaction_count=interaction.interaction_count + 1
+        """
+        호감도를 affinity_change만큼 바꾸고 상호작용 횟수를 1 늘리는 메서드
+
+        Redis 해시 카운터에 Lua 스크립트로 원자적으로 반영하므로 동시에 호출되어도 변경이 유실되지 않습니다.
+        DB에는 flush_dirty_interactions()가 주기적으로 묶어서 반영합니다.
+        """
+        keys = [self._counter_key(character_id, user_id), self.DIRTY_KEY]
+        args = [affinity_change, 1, datetime.now(timezone.utc).isoformat(), self.COUNTER_TTL, f"{character_id}:{user_id}"]
+
+        result = await self.redis_client.eval(self.APPLY_DELTA_SCRIPT, len(keys), *keys, *args)
+        if result is None:
+            # 카운터가 없으면(처음이거나 만료됨) DB 값으로 초기화
+            interaction = await self.get_interaction_from_db(character_id, user_id)
+            await self.redis_client.eval(
+                self.APPLY_DELTA_SCRIPT, len(keys), *keys, *args,
+                interaction.id, interaction.affinity, interaction.interaction_count
             )
-        )
-        # Redis 캐시 업데이트
-        self.redis_client.setex(f"interaction:{character_id}:{user_id}", 3600, json.dumps(updated_interaction.model_dump()))
+        await self.invalidate_counters(character_id, user_id)
+
+    async def flush_dirty_interactions(self) -> int:
+        """
+        변경된 호감도/상호작용 횟수 카운터를 DB에 한 번에 반영하는 메서드
+
+        :return: 반영한 상호작용 수
+        """
+        members: List[str] = await self.redis_client.spop(self.DIRTY_KEY, self.FLUSH_BATCH_SIZE) or []
+        return await self._flush_members(members)
+
+    async def _flush_members(self, members: List[str]) -> int:
+        if not members:
+            return 0
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for member in members:
+                character_id, user_id = member.split(":", 1)
+                pipe.hgetall(self._counter_key(character_id, user_id))
+            all_counters = await pipe.execute()
+
+        rows = []
+        for member, counters in zip(members, all_counters):
+            if not counters or not counters.get("id"):
+                continue
+            character_id, user_id = member.split(":", 1)
+            affinity = float(counters["affinity"])
+            # 한 번에 upsert하는 행들은 컬럼 구성이 같아야 함
+            rows.append({
+                "id": counters["id"],
+                "character_id": character_id,
+                "user_id": user_id,
+                "affinity": affinity,
+                "relationship_type": self.get_relationship_type(affinity).value,
+                "interaction_count": int(counters["interaction_count"]),
+                "last_interaction": counters["last_interaction"],
+            })
+
+        if not rows:
+            return 0
+        try:
+            await get_supabase_client().table("user_character_interactions").upsert(rows, on_conflict="id").execute()
+        except Exception:
+            # 다음 주기에 다시 시도하도록 되돌려 놓음
+            await self.redis_client.sadd(self.DIRTY_KEY, *members)
+            raise
+        return len(rows)
+
+    async def run_flusher(self, interval: float = RELATIONSHIP_FLUSH_INTERVAL):
+        """flush_dirty_interactions를 interval초마다 실행하는 루프 (취소되면 마지막으로 한 번 더 반영)"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    while await self.flush_dirty_interactions() >= self.FLUSH_BATCH_SIZE:
+                        pass
+                except Exception as e:
+                    logger.error(f"Failed to flush interaction counters: {str(e)}")
+        except asyncio.CancelledError:
+            await self.flush_dirty_interactions()
+            raise
     
     def get_affinity_level(self, affinity: float) -> str:
         if affinity <= -91:
@@ -124,19 +260,15 @@ class RelationshipService:
             raise ValueError("Affinity value out of bounds")
     
     async def update_custom_traits(self, character_id: str, user_id: str, custom_traits: dict):
-        updated_interaction = await self.update_interaction(
+        return await self.update_interaction(
             character_id,
             user_id,
             UserCharacterInteractionUpdate(custom_traits=custom_traits)
         )
-        # Redis 캐시 업데이트
-        self.redis_client.setex(f"interaction:{character_id}:{user_id}", 3600, json.dumps(updated_interaction.model_dump()))
 
     async def update_conversation_history(self, character_id: str, user_id: str, conversation_history: dict):
-        updated_interaction = await self.update_interaction(
+        return await self.update_interaction(
             character_id,
             user_id,
             UserCharacterInteractionUpdate(conversation_history=conversation_history)
-        )
-        # Redis 캐시 업데이트
-        self.redis_client.setex(f"interaction:{character_id}:{user_id}", 3600, json.dumps(updated_interaction.model_dump()))
\ No newline at end of file
+        )
\ No newline at end of file
@@ -0,0 +1,292 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.cache import LRUCache
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSION = 1536  # OpenAI의 text-embedding-ada-002 모델의 출력 차원
+
+# (id, 벡터, 메타데이터) - 메타데이터에는 conversation_id가 포함되어야 함
+VectorRecord = Tuple[str, Sequence[float], Dict[str, Any]]
+
+
+class VectorStore(ABC):
+    """메시지 임베딩을 저장하고 대화 단위로 유사도 검색을 하는 벡터 저장소 인터페이스"""
+
+    @abstractmethod
+    def upsert(self, vectors: List[VectorRecord]):
+        """벡터를 추가하거나 같은 id의 벡터를 교체하는 메서드"""
+
+    @abstractmethod
+    def query(self, vector: Sequence[float], conversation_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        특정 대화 안에서 코사인 유사도가 높은 벡터를 찾는 메서드
+
+        :return: id, score, metadata를 담은 결과 목록 (점수 내림차순)
+        """
+
+    @abstractmethod
+    def delete(self, ids: List[str], conversation_id: Optional[str] = None):
+        """id로 벡터를 삭제하는 메서드 (conversation_id를 주면 해당 대화에서만 찾음)"""
+
+
+class PineconeVectorStore(VectorStore):
+    """Pinecone 인덱스를 사용하는 벡터 저장소 (conversation_id 메타데이터 필터로 검색)"""
+
+    def __init__(self, index_name: Optional[str] = None):
+        from pinecone import Pinecone, ServerlessSpec
+
+        # Pinecone 초기화
+        self.pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
+
+        # 인덱스 이름 가져오기
+        index_name = index_name or os.environ.get("PINECONE_INDEX_NAME")
+
+        # 인덱스가 존재하지 않으면 생성
+        if index_name not in self.pc.list_indexes().names():
+            self.pc.create_index(
+                name=index_name,
+                dimension=EMBEDDING_DIMENSION,
+                metric='cosine',
+                spec=ServerlessSpec(cloud=os.environ.get("PINECONE_CLOUD", "aws"),
+                                    region=os.environ.get("PINECONE_REGION", "us-west-2"))
+            )
+
+        # 인덱스 연결
+        self.index = self.pc.Index(index_name)
+
+    def upsert(self, vectors: List[VectorRecord]):
+        self.index.upsert(vectors=[(id, list(vector), metadata) for id, vector, metadata in vectors])
+
+    def query(self, vector: Sequence[float], conversation_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        results = self.index.query(
+            vector=list(vector),
+            top_k=top_k,
+            include_metadata=True,
+            filter={"conversation_id": conversation_id}
+        )
+        return results['matches']
+
+    def delete(self, ids: List[str], conversation_id: Optional[str] = None):
+        self.index.delete(ids=ids)
+
+
+class _ConversationVectors:
+    """한 대화의 벡터 행렬(정규화된 float32)과 id/메타데이터"""
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], metadata: List[Dict[str, Any]], signature: Optional[Tuple] = None):
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata
+        self.positions = {id: i for i, id in enumerate(ids)}
+        self.signature = signature  # 읽을 당시 파일의 (inode, mtime, 크기) - 다른 프로세스의 변경 감지용
+
+
+class LocalVectorStore(VectorStore):
+    """
+    프로세스 내에서 대화별 NumPy 행렬로 정확한 코사인 top-k 검색을 하는 벡터 저장소
+
+    저장 형식 (대화마다 디렉터리 하나):
+        {base_path}/{conversation_id}/vectors.npy  - (n, dimension) float32, 행 단위로 L2 정규화됨
+        {base_path}/{conversation_id}/index.json   - {"ids": [...], "metadata": [...]} (행 순서와 동일)
+
+    vectors.npy는 메모리 매핑(mmap)으로 읽으며, 최근 사용한 대화만 LRU로 메모리에 유지합니다.
+    base_path가 None이면 디스크에 저장하지 않습니다 (테스트/벤치마크용).
+
+    여러 프로세스(API 워커, 요약 워커)가 같은 base_path를 공유할 수 있습니다.
+    - 쓰기는 대화별 잠금 파일({base_path}/{conversation_id}.lock)에 fcntl 배타 잠금을 잡고 읽기-수정-교체를 하며,
+      읽기는 공유 잠금을 잡아 vectors.npy와 index.json을 같은 버전으로 읽습니다.
+    - 캐시된 mmap은 사용할 때마다 파일의 (inode, mtime, 크기)를 확인해 다른 프로세스가 바꿨으면 다시 읽습니다.
+    """
+
+    def __init__(self, base_path: Optional[str] = None, dimension: int = EMBEDDING_DIMENSION, max_loaded_conversations: int = 1024):
+        self.base_path = base_path
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._memory_only: Dict[str, _ConversationVectors] = {}
+        self._loaded = LRUCache(maxsize=max_loaded_conversations)
+        if base_path:
+            os.makedirs(base_path, exist_ok=True)
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    def _conversation_dir(self, conversation_id: str) -> str:
+        return os.path.join(self.base_path, conversation_id)
+
+    @contextmanager
+    def _file_lock(self, conversation_id: str, exclusive: bool) -> Iterator[None]:
+        """다른 프로세스와 공유하는 대화별 잠금 (디스크에 저장하지 않으면 아무것도 하지 않음)"""
+        if not self.base_path:
+            yield
+            return
+        with open(os.path.join(self.base_path, f"{conversation_id}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _signature(self, conversation_id: str) -> Optional[Tuple]:
+        directory = self._conversation_dir(conversation_id)
+        try:
+            stats = [os.stat(os.path.join(directory, name)) for name in ("vectors.npy", "index.json")]
+        except FileNotFoundError:
+            return None
+        return tuple((stat.st_ino, stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    def _load(self, conversation_id: str, locked: bool = False) -> Optional[_ConversationVectors]:
+        """
+        대화의 벡터를 읽는 메서드 (캐시된 mmap은 파일이 바뀌지 않았을 때만 재사용)
+
+        :param locked: 호출하는 쪽이 이미 이 대화의 파일 잠금을 잡고 있으면 True
+        """
+        if not self.base_path:
+            return self._memory_only.get(conversation_id)
+
+        if not locked:
+            with self._file_lock(conversation_id, exclusive=False):
+                return self._load(conversation_id, locked=True)
+
+        signature = self._signature(conversation_id)
+        if signature is None:
+            self._loaded.delete(conversation_id)
+            return None
+
+        cached = self._loaded.get(conversation_id)
+        if cached is not None and cached.signature == signature:
+            return cached
+
+        directory = self._conversation_dir(conversation_id)
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        loaded = _ConversationVectors(np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r"), index["ids"], index["metadata"], signature)
+        self._loaded.set(conversation_id, loaded)
+        return loaded
+
+    def _save(self, conversation_id: str, vectors: _ConversationVectors):
+        if not self.base_path:
+            self._memory_only[conversation_id] = vectors
+            return
+
+        directory = self._conversation_dir(conversation_id)
+        if not vectors.ids:
+            shutil.rmtree(directory, ignore_errors=True)
+            self._loaded.delete(conversation_id)
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        # 임시 파일에 쓴 뒤 교체해서 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 함
+        vectors_tmp = os.path.join(directory, "vectors.tmp.npy")
+        index_tmp = os.path.join(directory, "index.tmp.json")
+        np.save(vectors_tmp, vectors.matrix)
+        with open(index_tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": vectors.ids, "metadata": vectors.metadata}, f, ensure_ascii=False)
+        os.replace(vectors_tmp, os.path.join(directory, "vectors.npy"))
+        os.replace(index_tmp, os.path.join(directory, "index.json"))
+
+        self._loaded.delete(conversation_id)
+
+    def upsert(self, vectors: List[VectorRecord]):
+        by_conversation: Dict[str, List[VectorRecord]] = {}
+        for record in vectors:
+            by_conversation.setdefault(str(record[2]["conversation_id"]), []).append(record)
+
+        with self._lock:
+            for conversation_id, records in by_conversation.items():
+                with self._file_lock(conversation_id, exclusive=True):
+                    self._upsert_conversation(conversation_id, records)
+
+    def _upsert_conversation(self, conversation_id: str, records: List[VectorRecord]):
+        existing = self._load(conversation_id, locked=True)
+        if existing is not None:
+            matrix = np.array(existing.matrix, dtype=np.float32)
+            ids, metadata = list(existing.ids), list(existing.metadata)
+            positions = dict(existing.positions)
+        else:
+            matrix = np.empty((0, self.dimension), dtype=np.float32)
+            ids, metadata, positions = [], [], {}
+
+        new_rows = self._normalize(np.asarray([record[1] for record in records], dtype=np.float32))
+        appended = []
+        for row, (id, _, meta) in zip(new_rows, records):
+            if id in positions:
+                matrix[positions[id]] = row
+                metadata[positions[id]] = meta
+            else:
+                positions[id] = len(ids) + len(appended)
+                appended.append(row)
+                ids.append(id)
+                metadata.append(meta)
+        if appended:
+            matrix = np.vstack([matrix, np.asarray(appended, dtype=np.float32)])
+
+        self._save(conversation_id, _ConversationVectors(matrix, ids, metadata))
+
+    def query(self, vector: Sequence[float], conversation_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        with self._lock:
+            vectors = self._load(conversation_id)
+        if vectors is None or not vectors.ids or top_k <= 0:
+            return []
+
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        scores = vectors.matrix @ query
+
+        k = min(top_k, len(vectors.ids))
+        if k < len(vectors.ids):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(vectors.ids))
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {"id": vectors.ids[i], "score": float(scores[i]), "metadata": vectors.metadata[i]}
+            for i in top
+        ]
+
+    def delete(self, ids: List[str], conversation_id: Optional[str] = None):
+        if conversation_id is not None:
+            conversation_ids = [conversation_id]
+        elif self.base_path:
+            conversation_ids = [name for name in os.listdir(self.base_path) if os.path.isdir(self._conversation_dir(name))]
+        else:
+            conversation_ids = list(self._memory_only)
+
+        targets = set(ids)
+        with self._lock:
+            for conversation_id in conversation_ids:
+                with self._file_lock(conversation_id, exclusive=True):
+                    existing = self._load(conversation_id, locked=True)
+                    if existing is None or not targets.intersection(existing.positions):
+                        continue
+                    keep = [i for i, id in enumerate(existing.ids) if id not in targets]
+                    self._save(conversation_id, _ConversationVectors(
+                        np.array(existing.matrix[keep], dtype=np.float32),
+                        [existing.ids[i] for i in keep],
+                        [existing.metadata[i] for i in keep]
+                    ))
+
+
+def create_vector_store() -> VectorStore:
+    """VECTOR_STORE_BACKEND 환경 변수(pinecone | local)에 맞는 벡터 저장소를 생성하는 함수"""
+    backend = os.environ.get("VECTOR_STORE_BACKEND", "pinecone").lower()
+    if backend == "local":
+        base_path = os.environ.get("LOCAL_VECTOR_STORE_PATH", "data/vectors") or None
+        logger.info(f"Using local vector store at {base_path}")
+        return LocalVectorStore(base_path)
+    if backend == "pinecone":
+        return PineconeVectorStore()
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.vector_store import VectorRecord, VectorStore
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# 종료 시 한꺼번에 비우기 위해 생성된 writer를 추적
+_writers: "weakref.WeakSet[VectorWriteBehind]" = weakref.WeakSet()
+
+
+class VectorWriteBehind:
+    """
+    벡터 upsert를 응답 경로에서 분리해 백그라운드에서 묶어 보내는 write-behind 파이프라인
+
+    submit()은 크기가 제한된 큐에 넣기만 하고 바로 반환합니다 (큐가 가득 차면 빈자리가 날 때까지 대기).
+    백그라운드 작업이 max_batch_size개가 모이거나 첫 항목 후 max_wait_ms가 지나면 한 번에 upsert하며,
+    실패하면 지수 백오프로 max_retries번까지 다시 시도합니다.
+    upsert는 기본 executor가 아닌 전용 스레드 풀에서 실행해 다른 작업의 스레드를 고갈시키지 않습니다.
+
+    :param vector_store: 벡터를 저장할 저장소
+    :param max_batch_size: 한 번에 upsert할 최대 벡터 수
+    :param max_wait_ms: 배치를 모으는 최대 대기 시간 (밀리초)
+    :param max_queue_size: 대기 중인 벡터의 최대 수
+    :param max_retries: 배치 하나의 최대 재시도 횟수
+    """
+
+    def __init__(self, vector_store: VectorStore, max_batch_size: int = 100, max_wait_ms: float = 200, max_queue_size: int = 10000, max_retries: int = 5, retry_base_delay: float = 0.5):
+        self.vector_store = vector_store
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-upsert")
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        _writers.add(self)
+
+    def _ensure_started(self):
+        # 큐와 작업은 이벤트 루프 안에서 처음 사용할 때 생성
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def submit(self, id: str, vector: List[float], metadata: Dict):
+        """벡터 하나를 upsert 대기열에 넣는 메서드"""
+        self._ensure_started()
+        await self._queue.put((id, vector, metadata))
+
+    async def _next_batch(self) -> List[VectorRecord]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[VectorRecord]):
+        # 같은 id가 여러 번 들어오면 마지막 벡터만 보냄
+        records = list({record[0]: record for record in batch}.values())
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(self.executor, self.vector_store.upsert, records)
+                self.written += len(records)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.dropped += len(records)
+                    logger.error(f"Dropping {len(records)} vectors after {attempt + 1} failed upserts: {str(e)}")
+                    return
+                delay = self.retry_base_delay * (2 ** attempt)
+                logger.warning(f"Vector upsert of {len(records)} failed, retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+
+    async def flush(self):
+        """대기 중인 벡터가 모두 저장(또는 재시도 후 포기)될 때까지 기다리는 메서드"""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def close(self):
+        """남은 벡터를 비우고 백그라운드 작업과 스레드 풀을 정리하는 메서드"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped
+        }
+
+
+async def close_vector_writers():
+    """모든 write-behind 파이프라인을 비우고 닫는 함수 (lifespan 종료 시 호출)"""
+    for writer in list(_writers):
+        try:
+            await writer.close()
+        except Exception as e:
+            logger.error(f"Failed to flush vector writer: {str(e)}")
@@ -0,0 +1,68 @@
+import hashlib
+import json
+from typing import Callable, Dict, Generic, Tuple, Type, TypeVar
+
+import orjson
+from pydantic import BaseModel
+
+from app.config import CACHE_CODEC
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _pydantic_codec() -> Tuple[Callable, Callable]:
+    # pydantic-core가 모델 <-> JSON을 직접 변환 (중간 dict, 두 번째 검증 없음)
+    return (
+        lambda model: model.model_dump_json(),
+        lambda model_class, payload: model_class.model_validate_json(payload),
+    )
+
+
+def _orjson_codec() -> Tuple[Callable, Callable]:
+    # orjson은 datetime/UUID/Enum을 기본으로 직렬화하며, 읽을 때는 pydantic-core가 JSON에서 바로 모델을 만듦
+    return (
+        lambda model: orjson.dumps(model.model_dump()).decode("utf-8"),
+        lambda model_class, payload: model_class.model_validate_json(payload),
+    )
+
+
+# 코덱 이름 -> (태그, 생성 함수) - 태그는 저장된 값에 함께 기록되어 다른 코덱으로 쓴 값을 구분함
+CODECS: Dict[str, Tuple[str, Callable[[], Tuple[Callable, Callable]]]] = {
+    "pydantic": ("p", _pydantic_codec),
+    "orjson": ("o", _orjson_codec),
+}
+
+
+def schema_version(model_class: Type[BaseModel]) -> str:
+    """모델의 JSON 스키마로 만든 짧은 버전 태그 (필드가 바뀌면 달라짐)"""
+    schema = json.dumps(model_class.model_json_schema(), sort_keys=True)
+    return hashlib.sha1(schema.encode("utf-8")).hexdigest()[:8]
+
+
+class ModelCodec(Generic[ModelT]):
+    """
+    캐시에 저장하는 pydantic 모델의 직렬화 코덱
+
+    저장 형식: "{코덱 태그}{스키마 버전}|{payload}"
+    읽을 때 코덱이나 스키마 버전이 다르면(배포 중 모델이 바뀐 경우 등) ValueError를 내므로,
+    호출하는 쪽에서는 캐시 miss로 처리하면 됩니다.
+
+    :param model_class: 직렬화할 모델 클래스
+    :param codec: CODECS의 이름 (기본값은 CACHE_CODEC 환경 변수)
+    """
+
+    def __init__(self, model_class: Type[ModelT], codec: str = CACHE_CODEC):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown cache codec: {codec}")
+        tag, factory = CODECS[codec]
+        self.model_class = model_class
+        self.header = f"{tag}{schema_version(model_class)}|"
+        self._encode, self._decode = factory()
+
+    def encode(self, model: ModelT) -> str:
+        return self.header + self._encode(model)
+
+    def decode(self, payload: str) -> ModelT:
+        if not payload.startswith(self.header):
+            raise ValueError(f"Cached {self.model_class.__name__} was written with a different codec or schema")
+        return self._decode(self.model_class, payload[len(self.header):])
@@ -0,0 +1,34 @@
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+# bytea 형식: [스케일 float32 (little-endian, 4바이트)] + [차원별 int8 값]
+# 1536차원 임베딩이 PostgREST로 오갈 때 JSON 배열(약 30KB) 대신 hex 문자열(약 3KB)이 됨
+SCALE_FORMAT = "<f"
+SCALE_SIZE = struct.calcsize(SCALE_FORMAT)
+
+
+def quantize_embedding(vector: List[float]) -> str:
+    """
+    임베딩을 int8로 양자화해 PostgREST bytea 입력 형식("\\x" + hex)으로 만드는 함수
+
+    벡터의 최대 절댓값을 127에 맞추는 대칭 양자화이므로 코사인 유사도 순위는 거의 그대로 유지됩니다.
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    peak = float(np.max(np.abs(values))) if values.size else 0.0
+    scale = peak / 127 if peak > 0 else 1.0
+    quantized = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+    return "\\x" + (struct.pack(SCALE_FORMAT, scale) + quantized.tobytes()).hex()
+
+
+def dequantize_embedding(raw: Optional[str]) -> Optional[List[float]]:
+    """PostgREST가 돌려준 bytea 값("\\x" + hex)을 float 리스트로 되돌리는 함수"""
+    if not raw:
+        return None
+    data = bytes.fromhex(raw[2:] if raw.startswith("\\x") else raw)
+    if len(data) < SCALE_SIZE:
+        raise ValueError("Quantized embedding is too short")
+    (scale,) = struct.unpack_from(SCALE_FORMAT, data)
+    quantized = np.frombuffer(data, dtype=np.int8, offset=SCALE_SIZE)
+    return (quantized.astype(np.float32) * scale).tolist()
@@ -0,0 +1,17 @@
+from typing import Any, Dict, List, Union
+
+
+def message_text(content: Union[str, List[Dict[str, Any]], None]) -> str:
+    """
+    메시지 content 블록 목록([{"type": "text", "text": ...}, ...])에서 텍스트만 이어 붙여 반환하는 함수
+
+    임베딩, 임베딩 캐시 키, 프롬프트에는 이 텍스트를 사용합니다. 이미 문자열이면 그대로 반환합니다.
+    """
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    return "\n".join(
+        str(block.get("text", "")) for block in content
+        if isinstance(block, dict) and block.get("type", "text") == "text" and block.get("text")
+    )
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import uuid
+import weakref
+from typing import List, Optional, Tuple
+
+from app.config import create_pubsub_client, get_redis_client
+from app.utils.cache import LRUCache
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class CacheInvalidationBus:
+    """
+    워커마다 있는 프로세스 내 캐시(near cache)를 Redis pub/sub으로 함께 무효화하는 버스
+
+    값을 쓴 워커가 "{보낸 워커 id}|{접두사}|{키}"를 채널에 발행하면,
+    다른 워커들은 같은 접두사로 등록된 로컬 캐시에서 해당 키를 지웁니다 (보낸 워커 자신은 무시).
+    구독이 끊겼다가 다시 연결되면 그동안의 메시지를 놓쳤을 수 있으므로 등록된 로컬 캐시를 모두 비웁니다.
+    구독은 공용 풀(명령 타임아웃 + 재시도)이 아닌 전용 연결을 사용해, 유휴 채널에서 조용히 재연결되는 일이 없도록 합니다.
+    """
+
+    CHANNEL = "cache_invalidation"
+
+    def __init__(self):
+        self.sender_id = uuid.uuid4().hex[:12]
+        self._caches: List[Tuple[str, "weakref.ReferenceType[LRUCache]"]] = []
+
+    def register(self, prefix: str, local: LRUCache):
+        """접두사에 해당하는 무효화 메시지를 받을 로컬 캐시를 등록하는 메서드"""
+        self._caches = [(p, ref) for p, ref in self._caches if ref() is not None]
+        self._caches.append((prefix, weakref.ref(local)))
+
+    def _locals(self, prefix: Optional[str] = None) -> List[LRUCache]:
+        caches = [ref() for p, ref in self._caches if prefix is None or p == prefix]
+        return [cache for cache in caches if cache is not None]
+
+    async def publish(self, prefix: str, key: str, origin: Optional[LRUCache] = None):
+        """
+        키 무효화를 알리는 메서드
+
+        :param origin: 방금 새 값을 넣은 로컬 캐시 (이 캐시를 제외한 같은 워커의 캐시는 바로 무효화)
+        """
+        for local in self._locals(prefix):
+            if local is not origin:
+                local.delete(key)
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            await redis_client.publish(self.CHANNEL, f"{self.sender_id}|{prefix}|{key}")
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed for {prefix}:{key}: {str(e)}")
+
+    def handle(self, message: str):
+        sender_id, prefix, key = message.split("|", 2)
+        if sender_id == self.sender_id:
+            return
+        for local in self._locals(prefix):
+            local.delete(key)
+
+    def clear_all(self):
+        for local in self._locals():
+            local.clear()
+
+    async def _on_reconnect(self, connection):
+        # 연결이 다시 맺어질 때마다 (redis-py 내부 재연결 포함) 놓친 무효화가 있을 수 있으므로 비움
+        self.clear_all()
+
+    async def run(self, retry_delay: float = 1.0, poll_timeout: float = 1.0):
+        """
+        무효화 채널을 구독하는 루프 (lifespan / 워커에서 백그라운드 작업으로 실행)
+
+        :param poll_timeout: 메시지를 기다리는 최대 시간 (초), 이 주기마다 health check가 실행될 수 있음
+        """
+        while True:
+            if get_redis_client() is None:
+                return
+            client = create_pubsub_client()
+            if client is None:
+                return
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                pubsub.connection.register_connect_callback(self._on_reconnect)
+                # 구독 전에 발행된 무효화는 받지 못했으므로 로컬 캐시를 비우고 시작
+                self.clear_all()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=poll_timeout)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    try:
+                        self.handle(message["data"])
+                    except ValueError:
+                        logger.warning(f"Malformed cache invalidation message: {message['data']}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost, retrying: {str(e)}")
+                await asyncio.sleep(retry_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+invalidation_bus = CacheInvalidationBus()
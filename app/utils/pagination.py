@@ -0,0 +1,54 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, id: Any) -> str:
+    """(created_at, id)를 불투명한 커서 문자열로 인코딩하는 함수"""
+    raw = json.dumps([created_at.isoformat(), str(id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # 형식 검증 (필터 문자열에 들어가므로 ISO 시각과 UUID만 허용하고 정규화된 값을 사용)
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, before: Optional[str] = None, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, oldest_first: bool = False):
+    """
+    PostgREST 쿼리에 (created_at, id) 기준 키셋 페이지네이션을 적용하는 함수
+
+    - after: 커서보다 새로운 행을 오래된 순으로 limit개
+    - before: 커서보다 오래된 행 중 가장 새로운 limit개 (커서가 없으면 최신 limit개)
+    - oldest_first: 커서가 없을 때 최신이 아닌 가장 오래된 limit개부터 반환 (after 커서로 끝까지 읽을 때의 첫 페이지)
+
+    :return: (쿼리, 결과를 뒤집어야 하는지 여부) - 결과는 항상 오래된 순으로 맞춰서 사용
+    """
+    if after or (oldest_first and not before):
+        if after:
+            created_at, id = decode_cursor(after)
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{id}")')
+        return query.order("created_at").order("id").limit(limit), False
+
+    if before:
+        created_at, id = decode_cursor(before)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{id}")')
+    return query.order("created_at", desc=True).order("id", desc=True).limit(limit), True
+
+
+def set_cursor_headers(response: Response, items: List[Any]):
+    """페이지의 첫/마지막 항목으로 이전(X-Before-Cursor)/다음(X-After-Cursor) 페이지 커서를 헤더에 설정하는 함수"""
+    if items:
+        response.headers["X-Before-Cursor"] = encode_cursor(items[0].created_at, items[0].id)
+        response.headers["X-After-Cursor"] = encode_cursor(items[-1].created_at, items[-1].id)
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import math
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from app.config import NEAR_CACHE_MAXSIZE, NEAR_CACHE_TTL, get_redis_client
+from app.utils.cache import LRUCache
+from app.utils.invalidation import invalidation_bus
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# 락을 가진 경우에만 삭제 (다른 워커가 새로 잡은 락을 지우지 않도록)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def is_not_found(error: Exception) -> bool:
+    return isinstance(error, HTTPException) and error.status_code == 404
+
+
+class ReadThroughCache:
+    """
+    Redis 읽기 캐시 (없으면 loader로 DB에서 읽어 저장)
+
+    - single-flight: 같은 키의 동시 miss는 프로세스 안에서는 Future 하나를 공유하고,
+      워커 간에는 짧은 Redis 락을 잡은 한 곳만 DB를 조회하며 나머지는 저장될 때까지 기다림
+    - 조기 갱신: 만료가 가까워지면 확률적으로(XFetch) 한 요청이 백그라운드에서 미리 갱신해
+      인기 있는 키가 한꺼번에 만료되지 않도록 함
+    - negative 캐시: loader가 404(HTTPException)를 내면 negative_ttl 동안 같은 404를 반환
+    - near 캐시: Redis 앞에 짧은 TTL의 프로세스 내 LRU를 두어 자주 읽는 키는 Redis 왕복 없이 반환하고,
+      set/delete 시 다른 워커의 LRU는 invalidation_bus(Redis pub/sub)로 무효화
+
+    Redis 값 형식: "+{만료 시각}:{조회 소요 시간}:{payload}" 또는 "-{만료 시각}:{조회 소요 시간}:{404 detail}"
+
+    :param prefix: Redis 키 접두사 (키는 "{prefix}:{key}")
+    :param encode: 값을 문자열로 바꾸는 함수
+    :param decode: 문자열을 값으로 되돌리는 함수
+    :param ttl: 값의 유효 시간 (초)
+    :param negative_ttl: 404 결과의 유효 시간 (초)
+    :param lock_ttl: 워커 간 조회 락의 유효 시간 (초)
+    :param beta: 조기 갱신 강도 (클수록 일찍 갱신, 0이면 사용 안 함)
+    :param near_ttl: 프로세스 내 LRU의 유효 시간 (초), 0이면 사용 안 함
+    :param near_maxsize: 프로세스 내 LRU의 최대 항목 수
+    """
+
+    def __init__(self, prefix: str, encode: Callable[[Any], str] = str, decode: Callable[[str], Any] = str, ttl: int = 3600, negative_ttl: int = 60, lock_ttl: float = 5.0, beta: float = 1.0, near_ttl: float = NEAR_CACHE_TTL, near_maxsize: int = NEAR_CACHE_MAXSIZE):
+        self.prefix = prefix
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock_ttl = lock_ttl
+        self.beta = beta
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self.near: Optional[LRUCache] = None
+        if near_ttl > 0:
+            self.near = LRUCache(maxsize=near_maxsize, ttl=near_ttl)
+            invalidation_bus.register(prefix, self.near)
+
+    def key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    @staticmethod
+    def _parse(raw: Optional[str]) -> Optional[Tuple[bool, float, float, str]]:
+        """(값 여부, 만료 시각, 조회 소요 시간, payload) - 형식이 다르면(이전 버전 값 등) None"""
+        if not raw or raw[0] not in "+-":
+            return None
+        try:
+            expires_at, delta, payload = raw[1:].split(":", 2)
+            return raw[0] == "+", float(expires_at), float(delta), payload
+        except ValueError:
+            return None
+
+    def _should_refresh_early(self, expires_at: float, delta: float) -> bool:
+        if self.beta <= 0:
+            return False
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= expires_at
+
+    def _result(self, key: str, found: bool, payload: str) -> Any:
+        value = self.decode(payload) if found else None
+        if self.near is not None:
+            self.near.set(key, (found, value if found else payload))
+        if found:
+            return value
+        raise HTTPException(status_code=404, detail=payload or "Not found")
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        키의 값을 반환하는 메서드 (캐시에 없으면 loader로 조회해 저장)
+
+        :param key: 캐시 키 (접두사 제외)
+        :param loader: DB에서 값을 읽는 비동기 함수 (없으면 404 HTTPException)
+        """
+        if self.near is not None:
+            near = self.near.get(key)
+            if near is not None:
+                found, value = near
+                if found:
+                    return value
+                raise HTTPException(status_code=404, detail=value or "Not found")
+
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                cached = self._parse(await redis_client.get(self.key(key)))
+            except Exception as e:
+                logger.warning(f"Cache read failed for {self.key(key)}: {str(e)}")
+                cached = None
+            if cached is not None:
+                found, expires_at, delta, payload = cached
+                try:
+                    result = self._result(key, found, payload)
+                except ValueError as e:
+                    # 다른 코덱/스키마로 저장된 값은 miss로 처리
+                    logger.debug(f"Ignoring undecodable cache entry {self.key(key)}: {str(e)}")
+                    return await self._load_once(key, loader)
+                if self._should_refresh_early(expires_at, delta) and key not in self._inflight:
+                    task = asyncio.ensure_future(self._load_once(key, loader))
+                    self._refreshing.add(task)
+                    task.add_done_callback(self._refresh_done)
+                return result
+
+        return await self._load_once(key, loader)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None and not is_not_found(task.exception()):
+            logger.warning(f"Early cache refresh failed: {str(task.exception())}")
+
+    async def _load_once(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """같은 키에 대한 동시 조회를 하나로 합치는 메서드"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # 기다리던 요청이 취소되어도 다른 요청을 위한 조회는 계속되도록 shield
+        return await asyncio.shield(future)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return await loader()
+
+        lock_key = f"{self.key(key)}:lock"
+        token = uuid.uuid4().hex
+        try:
+            locked = await redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Cache lock failed for {lock_key}: {str(e)}")
+            locked = True  # Redis에 문제가 있으면 락 없이 조회
+
+        if not locked:
+            # 다른 워커가 조회 중이면 값이 저장될 때까지 기다림 (락이 만료되면 직접 조회)
+            deadline = time.monotonic() + self.lock_ttl
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                cached = self._parse(await redis_client.get(self.key(key)))
+                if cached is not None and cached[1] > time.time():
+                    try:
+                        return self._result(key, cached[0], cached[3])
+                    except ValueError:
+                        break
+
+        started = time.perf_counter()
+        try:
+            value = await loader()
+        except Exception as e:
+            if is_not_found(e):
+                await self._store(False, key, e.detail or "", time.perf_counter() - started, self.negative_ttl)
+                if self.near is not None:
+                    self.near.set(key, (False, e.detail or ""))
+            raise
+        finally:
+            if locked:
+                try:
+                    await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception:
+                    pass
+        await self._store(True, key, self.encode(value), time.perf_counter() - started, self.ttl)
+        if self.near is not None:
+            self.near.set(key, (True, value))
+        return value
+
+    async def _store(self, found: bool, key: str, payload: str, delta: float, ttl: int):
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        raw = f"{'+' if found else '-'}{time.time() + ttl:.1f}:{delta:.3f}:{payload}"
+        try:
+            await redis_client.setex(self.key(key), ttl, raw)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {self.key(key)}: {str(e)}")
+
+    async def set(self, key: str, value: Any):
+        """DB에 쓴 직후 새 값을 캐시에 넣고 다른 워커의 near 캐시를 무효화하는 메서드"""
+        await self._store(True, key, self.encode(value), 0.0, self.ttl)
+        if self.near is not None:
+            self.near.set(key, (True, value))
+            await invalidation_bus.publish(self.prefix, key, origin=self.near)
+
+    async def delete(self, key: str):
+        """캐시에서 키를 지우고 다른 워커의 near 캐시를 무효화하는 메서드"""
+        if self.near is not None:
+            self.near.delete(key)
+            await invalidation_bus.publish(self.prefix, key)
+        redis_client = get_redis_client()
+        if redis_client is not None:
+            try:
+                await redis_client.delete(self.key(key))
+            except Exception as e:
+                logger.warning(f"Cache delete failed for {self.key(key)}: {str(e)}")
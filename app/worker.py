@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+from app.config import close_redis_client, init_redis_client
+from app.database import close_supabase_client, init_supabase_client
+from app.services.conversation_service import ConversationService
+from app.utils.invalidation import invalidation_bus
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    await init_supabase_client()
+    await init_redis_client()
+    conversation_service = ConversationService()
+    # 워커가 갱신한 호감도 카운터도 주기적으로 DB에 반영
+    relationship_flusher = asyncio.create_task(conversation_service.relationship_service.run_flusher())
+    invalidation_listener = asyncio.create_task(invalidation_bus.run())
+    try:
+        await conversation_service.summary_queue.run_worker(conversation_service.process_summary_job)
+    finally:
+        for task in (relationship_flusher, invalidation_listener):
+            task.cancel()
+        await asyncio.gather(relationship_flusher, invalidation_listener, return_exceptions=True)
+        await close_redis_client()
+        await close_supabase_client()
+
+
+if __name__ == "__main__":
+    # 대화 요약 / 호감도 계산 작업 워커 실행: python -m app.worker
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Summary job worker stopped")
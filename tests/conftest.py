@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+# app 모듈은 import 시점에 환경 변수를 읽으므로 가장 먼저 설정
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", tempfile.mkdtemp(prefix="vectors-"))
+os.environ.pop("UPSTASH_REDIS_URL", None)
+
+import pytest
+import tiktoken
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+
+class _ByteEncoding:
+    """BPE 파일을 내려받을 수 없는 환경에서 쓰는 바이트 단위 인코더"""
+
+    def encode(self, text: str):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+try:
+    tiktoken.encoding_for_model("gpt-3.5-turbo")
+except Exception:
+    tiktoken.encoding_for_model = lambda model: _ByteEncoding()
+
+import app.config
+import app.database
+from tests.fakes import FakeSupabase
+
+
+@pytest.fixture
+def redis_server():
+    return FakeServer()
+
+
+@pytest.fixture
+async def redis(redis_server, monkeypatch):
+    client = FakeRedis(server=redis_server, decode_responses=True)
+    monkeypatch.setattr(app.config, "redis_client", client)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    client = FakeSupabase()
+    monkeypatch.setattr(app.database, "supabase_client", client)
+    return client
@@ -0,0 +1,168 @@
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+def _split_top_level(expression: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _condition(term: str):
+    """PostgREST 필터 문자열(or_ / and(...))을 행 판정 함수로 바꿈 - 형식이 틀리면 ValueError"""
+    if term.startswith("and(") and term.endswith(")"):
+        conditions = [_condition(part) for part in _split_top_level(term[4:-1])]
+        return lambda row: all(condition(row) for condition in conditions)
+    match = re.fullmatch(r'(\w+)\.(eq|gt|lt|gte|lte)\.("(?:[^"]*)"|[^,()"]+)', term)
+    if not match:
+        raise ValueError(f"Unsupported filter term: {term}")
+    column, op, value = match.groups()
+    value = value.strip('"')
+    compare = {
+        "eq": lambda a, b: a == b,
+        "gt": lambda a, b: a > b,
+        "lt": lambda a, b: a < b,
+        "gte": lambda a, b: a >= b,
+        "lte": lambda a, b: a <= b,
+    }[op]
+    return lambda row: compare(str(row.get(column)), value)
+
+
+class FakeQuery:
+    """supabase-py 쿼리 빌더 중 앱에서 쓰는 부분만 메모리에서 흉내 내는 클래스"""
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters = []
+        self.orders = []
+        self.row_limit: Optional[int] = None
+        self.single_row = False
+
+    def select(self, columns: str = "*", **_):
+        self.columns = columns
+        return self
+
+    def insert(self, payload, **_):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "id", **_):
+        self.action, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload, **_):
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self, **_):
+        self.action = "delete"
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        wanted = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in wanted)
+        return self
+
+    def or_(self, expression: str):
+        conditions = [_condition(term) for term in _split_top_level(expression)]
+        self.filters.append(lambda row: any(condition(row) for condition in conditions))
+        return self
+
+    def order(self, column: str, desc: bool = False, **_):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    maybe_single = single
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(condition(row) for condition in self.filters)
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {column.strip(): row.get(column.strip()) for column in self.columns.split(",")}
+
+    async def execute(self):
+        self.client.queries.append(self)
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.action in ("insert", "upsert"):
+            payloads = self.payload if isinstance(self.payload, list) else [self.payload]
+            result = []
+            for payload in payloads:
+                row = self.client.with_defaults(payload)
+                existing = next((r for r in rows if self.action == "upsert" and str(r.get(self.on_conflict)) == str(row.get(self.on_conflict))), None)
+                if existing is not None:
+                    existing.update(row)
+                    result.append(dict(existing))
+                else:
+                    rows.append(row)
+                    result.append(dict(row))
+            return SimpleNamespace(data=result, count=None)
+        if self.action == "update":
+            result = []
+            for row in rows:
+                if self._matches(row):
+                    row.update(self.payload)
+                    result.append(dict(row))
+            return SimpleNamespace(data=result, count=None)
+        if self.action == "delete":
+            removed = [row for row in rows if self._matches(row)]
+            self.client.tables[self.table] = [row for row in rows if not self._matches(row)]
+            return SimpleNamespace(data=removed, count=None)
+
+        selected = [row for row in rows if self._matches(row)]
+        for column, desc in reversed(self.orders):
+            selected.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        if self.row_limit is not None:
+            selected = selected[:self.row_limit]
+        data = [self._project(row) for row in selected]
+        if self.single_row:
+            return SimpleNamespace(data=data[0] if data else None, count=None)
+        return SimpleNamespace(data=data, count=len(data))
+
+
+class FakeSupabase:
+    """테이블을 딕셔너리 목록으로 보관하는 메모리 Supabase 클라이언트 (id/created_at 기본값을 채움)"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.queries: List[FakeQuery] = []
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def with_defaults(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        row = {key: (str(value) if isinstance(value, uuid.UUID) else value) for key, value in payload.items()}
+        row.setdefault("id", str(uuid.uuid4()))
+        if "created_at" not in row:
+            self._clock += timedelta(seconds=1)
+            row["created_at"] = self._clock.isoformat()
+        return row
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
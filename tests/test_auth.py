@@ -0,0 +1,92 @@
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.services import auth_service
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+
+
+def make_token(key, algorithm: str, **claims) -> str:
+    payload = {"sub": "user-1", "email": "user@example.com", "aud": "authenticated", "exp": int(time.time()) + 60, **claims}
+    return jwt.encode(payload, key, algorithm=algorithm)
+
+
+class FakeAuthClient:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    async def get_user(self, token):
+        self.calls.append(token)
+        return SimpleNamespace(user=SimpleNamespace(id="remote-user", email="remote@example.com"))
+
+
+@pytest.fixture
+def remote_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(auth_service, "create_auth_client", lambda: FakeAuthClient(calls))
+
+    async def get_user_claims(user_id):
+        return {"is_admin": False}
+
+    monkeypatch.setattr(auth_service, "get_user_claims", get_user_claims)
+    return calls
+
+
+async def current_user(token: str):
+    return await auth_service.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+
+async def test_hs256_without_secret_falls_back_to_supabase_auth(monkeypatch, remote_calls):
+    monkeypatch.setattr(auth_service, "SUPABASE_JWT_SECRET", None)
+    token = make_token(SECRET, "HS256")
+
+    user = await current_user(token)
+
+    assert user.id == "remote-user"
+    assert remote_calls == [token]
+
+
+async def test_hs256_with_secret_is_verified_locally(monkeypatch, remote_calls):
+    monkeypatch.setattr(auth_service, "SUPABASE_JWT_SECRET", SECRET)
+
+    user = await current_user(make_token(SECRET, "HS256"))
+
+    assert user.id == "user-1"
+    assert remote_calls == []
+    with pytest.raises(HTTPException) as error:
+        await current_user(make_token("another-secret-that-is-also-32-characters-long", "HS256"))
+    assert error.value.status_code == 401
+
+
+async def test_rs256_is_verified_with_jwks(monkeypatch, remote_calls):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks_client = SimpleNamespace(get_signing_key_from_jwt=lambda token: SimpleNamespace(key=private_key.public_key()))
+    monkeypatch.setattr(auth_service, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(auth_service, "_get_jwks_client", lambda: jwks_client)
+
+    user = await current_user(make_token(private_key, "RS256"))
+
+    assert user.id == "user-1"
+    assert remote_calls == []
+
+
+async def test_unsigned_token_is_rejected(monkeypatch, remote_calls):
+    monkeypatch.setattr(auth_service, "SUPABASE_JWT_SECRET", SECRET)
+
+    with pytest.raises(HTTPException) as error:
+        await current_user(make_token(None, "none"))
+
+    assert error.value.status_code == 401
+    assert remote_calls == []
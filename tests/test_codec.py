@@ -0,0 +1,72 @@
+import random
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from app.models.conversation import ConversationProfile
+from app.utils.codec import CODECS, ModelCodec, schema_version
+from app.utils.embedding_codec import dequantize_embedding, quantize_embedding
+from app.utils.read_through import ReadThroughCache
+
+
+def make_conversation() -> ConversationProfile:
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return ConversationProfile(id=uuid.uuid4(), user_id="user-1", character_id="character-1", context={"mood": "좋음"}, created_at=now, updated_at=now)
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_model_codec_round_trip(codec):
+    conversation = make_conversation()
+    encoded = ModelCodec(ConversationProfile, codec).encode(conversation)
+    assert ModelCodec(ConversationProfile, codec).decode(encoded) == conversation
+
+
+def test_payload_from_other_codec_or_schema_is_rejected():
+    encoded = ModelCodec(ConversationProfile, "pydantic").encode(make_conversation())
+    with pytest.raises(ValueError):
+        ModelCodec(ConversationProfile, "orjson").decode(encoded)
+
+    class ConversationV2(ConversationProfile):
+        title: str = ""
+
+    assert schema_version(ConversationV2) != schema_version(ConversationProfile)
+    with pytest.raises(ValueError):
+        ModelCodec(ConversationV2, "pydantic").decode(encoded)
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        ModelCodec(BaseModel, "msgpack")
+
+
+async def test_read_through_cache_reloads_entries_written_by_another_codec(redis):
+    conversation = make_conversation()
+    old, new = ModelCodec(ConversationProfile, "pydantic"), ModelCodec(ConversationProfile, "orjson")
+    writer = ReadThroughCache("codec_test", encode=old.encode, decode=old.decode, near_ttl=0)
+    reader = ReadThroughCache("codec_test", encode=new.encode, decode=new.decode, near_ttl=0)
+    await writer.set("key", conversation)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return conversation
+
+    assert await reader.get("key", loader) == conversation
+    assert await reader.get("key", loader) == conversation
+    assert len(loads) == 1
+
+
+def test_embedding_quantization_keeps_direction_and_shrinks_payload():
+    vector = [random.gauss(0, 0.03) for _ in range(1536)]
+
+    encoded = quantize_embedding(vector)
+    decoded = np.array(dequantize_embedding(encoded))
+
+    original = np.array(vector)
+    assert encoded.startswith("\\x") and len(encoded) == 2 + 2 * (4 + 1536)
+    assert original @ decoded / (np.linalg.norm(original) * np.linalg.norm(decoded)) > 0.999
+    assert dequantize_embedding(quantize_embedding([0.0, 0.0])) == [0.0, 0.0]
+    assert dequantize_embedding(None) is None
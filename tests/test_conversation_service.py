@@ -0,0 +1,205 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.models.conversation import MessageCreate
+from app.services.auth_service import User
+from app.services import conversation_service
+from app.services.conversation_service import ConversationService
+from app.services.vector_store import LocalVectorStore
+
+REPLY_TOKENS = ["안녕", "하세요", "!"]
+
+
+class FakeReplyChain:
+    def __init__(self, calls, fail_after=None):
+        self.calls = calls
+        self.fail_after = fail_after
+
+    async def ainvoke(self, inputs):
+        self.calls.append(inputs)
+        return "".join(REPLY_TOKENS)
+
+    async def astream(self, inputs):
+        self.calls.append(inputs)
+        for i, token in enumerate(REPLY_TOKENS):
+            if i == self.fail_after:
+                raise RuntimeError("upstream failed")
+            yield token
+
+
+@pytest.fixture
+def user():
+    return User(id=str(uuid.uuid4()), email="user@example.com")
+
+
+@pytest.fixture
+def conversation(supabase, user):
+    character_id = str(uuid.uuid4())
+    row = supabase.with_defaults({"user_id": user.id, "character_id": character_id, "context": {}, "state": {}})
+    row["updated_at"] = row["created_at"]
+    supabase.tables["conversations"] = [row]
+    supabase.tables["user_character_interactions"] = [
+        supabase.with_defaults({"user_id": user.id, "character_id": character_id, "affinity": 10})
+    ]
+    return row
+
+
+@pytest.fixture
+async def service(redis, supabase):
+    service = ConversationService()
+    service.embedded = []
+    service.vectorized = []
+    service.stored_vectors = []
+    service.reply_calls = []
+
+    async def embed_batch(texts):
+        assert all(isinstance(text, str) for text in texts)
+        service.embedded.extend(texts)
+        return [[float(len(text)), 1.0] + [0.0] * 1534 for text in texts]
+
+    async def store_vector_async(id, vector, metadata):
+        service.stored_vectors.append((id, metadata))
+
+    vectorize_text = service.ai_service.vectorize_text
+
+    async def recording_vectorize_text(text):
+        service.vectorized.append(text)
+        return await vectorize_text(text)
+
+    service.ai_service.embed_batch = embed_batch
+    service.ai_service.vectorize_text = recording_vectorize_text
+    service.ai_service.embedding_batcher.embed_many = embed_batch
+    service.ai_service.store_vector_async = store_vector_async
+    service.chains.reply_chain = lambda max_tokens: FakeReplyChain(service.reply_calls)
+    return service
+
+
+def user_message(conversation, text):
+    return MessageCreate(conversation_id=conversation["id"], sender_type="user", content=[{"type": "text", "text": text}])
+
+
+async def test_create_message_embeds_text_of_list_content(service, supabase, conversation, user):
+    created = await service.create_message(conversation["id"], user_message(conversation, "오늘 날씨 어때?"), user)
+
+    assert created.content == [{"type": "text", "text": "오늘 날씨 어때?"}]
+    assert service.embedded == ["오늘 날씨 어때?"]
+    row = supabase.tables["messages"][0]
+    assert row["embedding_q8"].startswith("\\x")
+    assert "embedding" not in row
+    assert service.stored_vectors == [(str(created.id), {
+        "conversation_id": conversation["id"],
+        "content": "오늘 날씨 어때?",
+        "created_at": created.created_at.isoformat()
+    })]
+
+
+async def test_stream_message_and_respond_saves_reply(service, supabase, conversation, user):
+    response = await service.stream_message_and_respond(conversation["id"], user_message(conversation, "안녕?"), user)
+
+    body = "".join([chunk async for chunk in response.body_iterator])
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["message", "token", "token", "token", "done"]
+    assert json.loads(events[-1][1].removeprefix("data: ")) == {"content": "안녕하세요!"}
+
+    # 스트림이 닫힌 뒤 실행되는 저장 작업
+    await response.background()
+
+    messages = supabase.tables["messages"]
+    assert [message["sender_type"] for message in messages] == ["user", "character"]
+    assert messages[1]["content"] == [{"type": "text", "text": "안녕하세요!"}]
+    # 저장, 유사 메시지 검색, 응답 저장 모두 content 블록이 아닌 텍스트로 임베딩함
+    assert service.vectorized == ["안녕?", "안녕?", "안녕하세요!"]
+    assert service.embedded == ["안녕?", "안녕하세요!"]
+    assert "user: 안녕?" in service.reply_calls[0]["recent_messages"]
+
+
+def sse_events(body):
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    return [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))) for lines in events]
+
+
+@pytest.mark.parametrize("fail_after", [0, 2])
+async def test_failed_stream_sends_error_and_saves_no_reply(service, supabase, conversation, user, fail_after):
+    service.chains.reply_chain = lambda max_tokens: FakeReplyChain(service.reply_calls, fail_after=fail_after)
+    response = await service.stream_message_and_respond(conversation["id"], user_message(conversation, "안녕?"), user)
+
+    events = sse_events("".join([chunk async for chunk in response.body_iterator]))
+    await response.background()
+
+    assert [name for name, _ in events] == ["message"] + ["token"] * fail_after + ["error"]
+    # 실패한 응답은 사과 문구든 부분 응답이든 캐릭터 메시지로 저장/벡터화하지 않음
+    assert [message["sender_type"] for message in supabase.tables["messages"]] == ["user"]
+    assert service.embedded == ["안녕?"]
+
+
+async def test_open_streams_are_bounded_but_release_the_llm_slot(service, conversation, user, monkeypatch):
+    llm_slots, stream_slots = asyncio.Semaphore(1), asyncio.Semaphore(1)
+    monkeypatch.setattr(conversation_service, "get_llm_semaphore", lambda: llm_slots)
+    monkeypatch.setattr(conversation_service, "get_llm_stream_semaphore", lambda: stream_slots)
+    monkeypatch.setattr(conversation_service, "LLM_STREAM_ACQUIRE_TIMEOUT", 0.05)
+
+    def stream():
+        return service.stream_ai_response(conversation["id"], user.id, conversation["character_id"], "안녕?")
+
+    slow_client = stream()
+    assert await slow_client.__anext__() == REPLY_TOKENS[0]
+    # 첫 토큰 이후에는 LLM 호출 슬롯을 놓지만, 열린 스트림 슬롯은 끝날 때까지 점유
+    assert not llm_slots.locked()
+    assert stream_slots.locked()
+    with pytest.raises(asyncio.TimeoutError):
+        [token async for token in stream()]
+    assert len(service.reply_calls) == 1
+
+    assert [token async for token in slow_client] == REPLY_TOKENS[1:]
+    assert not stream_slots.locked()
+    assert [token async for token in stream()] == REPLY_TOKENS
+
+
+async def test_create_message_and_respond_saves_character_reply(service, supabase, conversation, user):
+    created = await service.create_message_and_respond(conversation["id"], user_message(conversation, "뭐 해?"), user)
+
+    assert created.sender_type == "user"
+    messages = supabase.tables["messages"]
+    assert [message["sender_type"] for message in messages] == ["user", "character"]
+    assert messages[1]["content"] == [{"type": "text", "text": "안녕하세요!"}]
+
+
+async def test_get_similar_messages_batch_fetches_within_conversation(service, supabase, conversation, user):
+    service.ai_service.vector_store = LocalVectorStore(base_path=None, dimension=1536)
+    first = await service.create_message(conversation["id"], user_message(conversation, "짧은 글"), user)
+    second = await service.create_message(conversation["id"], user_message(conversation, "조금 더 긴 글입니다"), user)
+    for message in (first, second):
+        vector = await service.ai_service.vectorize_text(message.content[0]["text"])
+        service.ai_service.vector_store.upsert([(str(message.id), vector, {"conversation_id": conversation["id"]})])
+    supabase.queries.clear()
+
+    similar = await service.get_similar_messages(conversation["id"], "짧은 글", top_k=2)
+
+    assert [message.id for message in similar] == [first.id, second.id]
+    message_queries = [query for query in supabase.queries if query.table == "messages"]
+    assert len(message_queries) == 1
+
+
+async def test_required_context_failure_cancels_other_fetches(service, conversation, user):
+    finished = []
+
+    async def slow_similar_messages(conversation_id, text, top_k):
+        await asyncio.sleep(0.1)
+        finished.append("similar_messages")
+        return []
+
+    async def failing_interaction(character_id, user_id):
+        raise RuntimeError("relationship unavailable")
+
+    service.get_similar_messages = slow_similar_messages
+    service.relationship_service.get_interaction = failing_interaction
+
+    with pytest.raises(RuntimeError):
+        await service.gather_response_context(conversation["id"], user.id, conversation["character_id"], "안녕?")
+    await asyncio.sleep(0.2)
+
+    assert finished == []
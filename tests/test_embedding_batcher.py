@@ -0,0 +1,29 @@
+import asyncio
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+async def test_concurrent_requests_share_one_call_and_deduplicate():
+    calls = []
+
+    async def embed_many(texts):
+        calls.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_many, max_batch_size=8, max_wait_ms=1)
+
+    vectors = await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "a"]))
+
+    assert vectors == [[1.0], [2.0], [1.0]]
+    assert calls == [["a", "bb"]]
+
+
+async def test_short_response_fails_every_caller_in_the_batch():
+    async def embed_many(texts):
+        return [[0.0]]
+
+    batcher = EmbeddingBatcher(embed_many, max_batch_size=8, max_wait_ms=1)
+
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.embed(text) for text in ["a", "b", "c"]), return_exceptions=True), 1)
+
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+import app.config
+from app.utils import invalidation
+from app.utils.cache import LRUCache
+from app.utils.invalidation import CacheInvalidationBus
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def listening_bus(redis, redis_server, monkeypatch):
+    subscriptions = []
+
+    def create_pubsub_client():
+        subscriptions.append(1)
+        return FakeRedis(server=redis_server, decode_responses=True)
+
+    monkeypatch.setattr(invalidation, "create_pubsub_client", create_pubsub_client)
+    bus, local = CacheInvalidationBus(), LRUCache()
+    bus.register("characters", local)
+    task = asyncio.create_task(bus.run(retry_delay=0.01, poll_timeout=0.05))
+    await wait_until(lambda: subscriptions)
+    await wait_until(lambda: redis_server.connected and bool(redis_server.subscribers))
+    yield bus, local, subscriptions
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_listener_deletes_keys_published_by_other_workers(listening_bus, redis):
+    bus, local, _ = listening_bus
+    local.set("a", 1)
+    local.set("b", 2)
+
+    await redis.publish(bus.CHANNEL, "another-worker|characters|a")
+    await bus.publish("characters", "b")  # 자기 자신이 보낸 메시지는 무시하지만 로컬은 바로 지움
+
+    await wait_until(lambda: "a" not in local)
+    assert "b" not in local
+
+
+async def test_listener_clears_local_caches_after_reconnect(listening_bus, redis_server):
+    bus, local, subscriptions = listening_bus
+    await asyncio.sleep(0.1)
+    local.set("a", 1)
+
+    redis_server.connected = False
+    await wait_until(lambda: len(subscriptions) > 1)
+    redis_server.connected = True
+    await wait_until(lambda: "a" not in local)
+
+
+async def test_pubsub_client_has_no_command_timeout_or_silent_retries(monkeypatch):
+    monkeypatch.setattr(app.config, "redis_url", "redis://:secret@localhost:6379")
+    client = app.config.create_pubsub_client()
+    kwargs = client.connection_pool.connection_kwargs
+
+    assert kwargs["socket_timeout"] is None
+    assert kwargs["retry_on_timeout"] is False
+    assert kwargs["health_check_interval"] > 0
+    await client.aclose()
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from app.services.job_queue import SummaryJobQueue
+
+
+@pytest.fixture
+def queue(redis):
+    return SummaryJobQueue(redis=redis, retry_backoff=0.0, poll_timeout=1, max_attempts=2)
+
+
+async def test_enqueue_deduplicates_pending_conversations(queue, redis):
+    assert await queue.enqueue("conversation-1", "user-1") is True
+    assert await queue.enqueue("conversation-1", "user-1") is False
+    assert await queue.enqueue("conversation-2", "user-1") is True
+
+    assert await redis.llen(queue.QUEUE_KEY) == 2
+    assert await redis.smembers(queue.PENDING_KEY) == {"conversation-1", "conversation-2"}
+
+
+async def test_jobs_are_processed_from_a_per_worker_list(queue, redis):
+    await queue.enqueue("conversation-1", "user-1")
+    handled = []
+
+    async def handler(job):
+        assert await redis.llen(queue.processing_key) == 1
+        handled.append(job["conversation_id"])
+
+    await queue.process(await queue.dequeue(), handler)
+
+    assert handled == ["conversation-1"]
+    assert await redis.llen(queue.processing_key) == 0
+    # 처리를 시작하면 같은 대화의 새 작업을 다시 받을 수 있음
+    assert await queue.enqueue("conversation-1", "user-1") is True
+
+
+async def test_requeue_only_takes_jobs_of_expired_workers(redis):
+    live, dead, starting = (SummaryJobQueue(redis=redis, poll_timeout=1) for _ in range(3))
+    for worker in (live, dead):
+        await worker.heartbeat()
+    await live.enqueue("conversation-live", "user-1")
+    await live.dequeue()
+    await dead.enqueue("conversation-dead", "user-1")
+    await dead.dequeue()
+
+    # dead 워커의 heartbeat가 만료됨
+    await redis.delete(dead._heartbeat_key(dead.worker_id))
+
+    assert await starting.requeue_stale_jobs() == 1
+    assert [json.loads(job)["conversation_id"] for job in await redis.lrange(starting.QUEUE_KEY, 0, -1)] == ["conversation-dead"]
+    assert await redis.llen(live.processing_key) == 1
+    assert await redis.smembers(starting.WORKERS_KEY) == {live.worker_id}
+
+
+async def test_failed_job_is_retried_then_buried(queue, redis):
+    await queue.enqueue("conversation-1", "user-1")
+
+    async def failing(job):
+        raise RuntimeError("boom")
+
+    await queue.process(await queue.dequeue(), failing)
+    assert await redis.zcard(queue.DELAYED_KEY) == 1
+    assert await redis.sismember(queue.PENDING_KEY, "conversation-1")
+    assert await redis.llen(queue.processing_key) == 0
+
+    assert await queue.promote_due_jobs() == 1
+    await queue.process(await queue.dequeue(), failing)
+
+    dead = [json.loads(job) for job in await redis.lrange(queue.DEAD_KEY, 0, -1)]
+    assert [(job["conversation_id"], job["attempts"]) for job in dead] == [("conversation-1", 2)]
+    assert await redis.zcard(queue.DELAYED_KEY) == 0
+    assert await redis.llen(queue.processing_key) == 0
@@ -0,0 +1,103 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import conversation_service
+from app.services.auth_service import User
+from app.services.conversation_service import ConversationService
+from app.utils.pagination import apply_keyset, decode_cursor, encode_cursor
+
+
+def raw_cursor(created_at, id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, id]).encode("utf-8")).decode("ascii")
+
+
+class RecordingQuery:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return record
+
+
+def test_cursor_round_trip():
+    created_at, id = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at.isoformat(), str(id))
+
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor("2024-01-01T00:00:00", "1,id.gt.0)"),
+    raw_cursor("2024-01-01T00:00:00\",id.gt.\"0", str(uuid.uuid4())),
+    raw_cursor("2024-01-01T00:00:00", 123),
+    "not-a-cursor",
+])
+def test_decode_cursor_rejects_malformed_values(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_apply_keyset_quotes_cursor_values():
+    id = uuid.uuid4()
+    query = RecordingQuery()
+    apply_keyset(query, after=encode_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), id), limit=10)
+
+    name, args, _ = query.calls[0]
+    assert name == "or_"
+    assert args[0] == f'created_at.gt."2024-01-01T00:00:00+00:00",and(created_at.eq."2024-01-01T00:00:00+00:00",id.gt."{id}")'
+
+
+@pytest.fixture
+async def paged_conversation(redis, supabase):
+    user = User(id=str(uuid.uuid4()), email="user@example.com")
+    conversation = supabase.with_defaults({"user_id": user.id, "character_id": str(uuid.uuid4())})
+    conversation["updated_at"] = conversation["created_at"]
+    supabase.tables["conversations"] = [conversation]
+    supabase.tables["messages"] = [
+        supabase.with_defaults({"conversation_id": conversation["id"], "sender_type": "user", "content": [{"type": "text", "text": str(i)}], "metadata": {}})
+        for i in range(7)
+    ]
+    return ConversationService(), conversation["id"], user
+
+
+async def test_list_messages_walks_pages_in_both_directions(paged_conversation):
+    service, conversation_id, user = paged_conversation
+
+    latest = await service.list_messages(conversation_id, user, limit=2)
+    assert [m.content[0]["text"] for m in latest] == ["5", "6"]
+
+    older = await service.list_messages(conversation_id, user, before=encode_cursor(latest[0].created_at, latest[0].id), limit=2)
+    assert [m.content[0]["text"] for m in older] == ["3", "4"]
+
+    newer = await service.list_messages(conversation_id, user, after=encode_cursor(older[-1].created_at, older[-1].id), limit=5)
+    assert [m.content[0]["text"] for m in newer] == ["5", "6"]
+
+
+async def test_stream_messages_sends_every_page_once_in_order(paged_conversation, monkeypatch):
+    service, conversation_id, user = paged_conversation
+    monkeypatch.setattr(conversation_service, "MAX_PAGE_SIZE", 3)
+
+    response = await service.stream_messages(conversation_id, user)
+    lines = [json.loads(line) async for line in response.body_iterator]
+
+    assert [line["content"][0]["text"] for line in lines] == [str(i) for i in range(7)]
+
+
+async def test_stream_conversations_sends_every_page_once_in_order(supabase, monkeypatch):
+    user = User(id=str(uuid.uuid4()), email="user@example.com")
+    supabase.tables["conversations"] = [supabase.with_defaults({"user_id": user.id, "character_id": str(i)}) for i in range(5)]
+    for row in supabase.tables["conversations"]:
+        row["updated_at"] = row["created_at"]
+    monkeypatch.setattr(conversation_service, "MAX_PAGE_SIZE", 2)
+
+    response = await ConversationService().stream_conversations(user)
+    lines = [json.loads(line) async for line in response.body_iterator]
+
+    assert [line["character_id"] for line in lines] == [str(i) for i in range(5)]
@@ -0,0 +1,87 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.conversation import MessageProfile
+from app.services.recent_messages import RecentMessageStore
+
+CONVERSATION_ID = str(uuid.uuid4())
+STARTED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_message(i: int) -> MessageProfile:
+    return MessageProfile(
+        id=uuid.uuid4(), conversation_id=CONVERSATION_ID, sender_type="user",
+        content=[{"type": "text", "text": str(i)}], created_at=STARTED + timedelta(seconds=i)
+    )
+
+
+def texts(messages):
+    return [message.content[0]["text"] for message in messages]
+
+
+class FakeMessageTable:
+    """DB 역할: 저장된 메시지와 loader 호출 횟수를 기록"""
+
+    def __init__(self, count: int = 0):
+        self.messages = [make_message(i) for i in range(count)]
+        self.loads = 0
+
+    async def load(self, limit: int):
+        self.loads += 1
+        return self.messages[-limit:]
+
+
+@pytest.fixture
+def store(redis):
+    return RecentMessageStore(capacity=5)
+
+
+async def test_miss_refills_and_short_conversation_is_served_from_cache(store):
+    table = FakeMessageTable(3)
+
+    assert texts(await store.get(CONVERSATION_ID, 2, table.load)) == ["1", "2"]
+    # 대화가 capacity보다 짧으면 끝 표시가 있어 limit보다 적어도 캐시에서 반환
+    assert texts(await store.get(CONVERSATION_ID, 5, table.load)) == ["0", "1", "2"]
+    assert table.loads == 1
+
+
+async def test_push_appends_and_trims_to_capacity(store):
+    table = FakeMessageTable(4)
+    await store.get(CONVERSATION_ID, 1, table.load)
+
+    for i in range(4, 8):
+        message = make_message(i)
+        table.messages.append(message)
+        await store.push(CONVERSATION_ID, message)
+
+    assert texts(await store.get(CONVERSATION_ID, 5, table.load)) == ["3", "4", "5", "6", "7"]
+    assert table.loads == 1
+
+
+async def test_message_saved_during_refill_is_not_lost(store):
+    table = FakeMessageTable(2)
+    late = make_message(2)
+
+    async def load_then_insert(limit: int):
+        snapshot = await table.load(limit)
+        # 스냅샷을 읽은 뒤, refill 전에 다른 요청이 메시지를 저장하고 push (버퍼가 없어 LPUSHX는 무시됨)
+        table.messages.append(late)
+        await store.push(CONVERSATION_ID, late)
+        return snapshot
+
+    assert texts(await store.get(CONVERSATION_ID, 5, load_then_insert)) == ["0", "1"]
+    # 오래된 스냅샷으로 채우지 않았으므로 다음 조회는 DB에서 새 메시지까지 읽음
+    assert texts(await store.get(CONVERSATION_ID, 5, table.load)) == ["0", "1", "2"]
+    assert texts(await store.get(CONVERSATION_ID, 5, table.load)) == ["0", "1", "2"]
+    assert table.loads == 2
+
+
+async def test_malformed_buffer_is_replaced(store, redis):
+    await redis.rpush(store._key(CONVERSATION_ID), "not a message")
+    table = FakeMessageTable(2)
+
+    assert texts(await store.get(CONVERSATION_ID, 1, table.load)) == ["1"]
+    assert texts(await store.get(CONVERSATION_ID, 2, table.load)) == ["0", "1"]
+    assert table.loads == 1
@@ -0,0 +1,15 @@
+import pytest
+from fastapi import HTTPException
+
+from app.routes import conversations
+from app.services.auth_service import User
+
+
+async def test_embedding_cache_stats_are_admin_only():
+    with pytest.raises(HTTPException) as error:
+        await conversations.get_embedding_cache_stats_route(User(id="user-1", email="user@example.com"))
+    assert error.value.status_code == 403
+
+    stats = await conversations.get_embedding_cache_stats_route(User(id="admin-1", email="admin@example.com", is_admin=True))
+    assert stats["scope"] == "worker"
+    assert {"local_hits", "redis_hits", "misses"} <= set(stats)
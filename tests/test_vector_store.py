@@ -0,0 +1,59 @@
+import multiprocessing
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+
+DIMENSION = 8
+CONVERSATION_ID = "conversation-1"
+
+
+def unit_vector(i: int):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[i % DIMENSION] = 1.0
+    return vector.tolist()
+
+
+def record(i: int):
+    return (f"message-{i}", unit_vector(i), {"conversation_id": CONVERSATION_ID})
+
+
+def upsert_many(base_path: str, start: int, count: int):
+    store = LocalVectorStore(base_path, dimension=DIMENSION)
+    for i in range(start, start + count):
+        store.upsert([record(i)])
+
+
+def test_query_returns_nearest_vectors(tmp_path):
+    store = LocalVectorStore(str(tmp_path), dimension=DIMENSION)
+    store.upsert([record(i) for i in range(3)])
+
+    matches = store.query(unit_vector(1), CONVERSATION_ID, top_k=2)
+
+    assert matches[0]["id"] == "message-1"
+    assert matches[0]["score"] == 1.0
+
+
+def test_reader_sees_vectors_written_by_another_store(tmp_path):
+    reader = LocalVectorStore(str(tmp_path), dimension=DIMENSION)
+    writer = LocalVectorStore(str(tmp_path), dimension=DIMENSION)
+    writer.upsert([record(0)])
+    assert [match["id"] for match in reader.query(unit_vector(0), CONVERSATION_ID, top_k=5)] == ["message-0"]
+
+    writer.upsert([record(1)])
+    writer.delete(["message-0"], CONVERSATION_ID)
+
+    assert [match["id"] for match in reader.query(unit_vector(1), CONVERSATION_ID, top_k=5)] == ["message-1"]
+
+
+def test_concurrent_writer_processes_do_not_lose_updates(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=upsert_many, args=(str(tmp_path), start * 10, 10)) for start in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    matches = LocalVectorStore(str(tmp_path), dimension=DIMENSION).query(unit_vector(0), CONVERSATION_ID, top_k=100)
+    assert sorted(match["id"] for match in matches) == sorted(f"message-{i}" for i in range(40))